@@ -0,0 +1,224 @@
+"""Асинхронные версии читающих эндпоинтов для развёртывания под ASGI.
+
+Список и карточка рецепта, теги, автодополнение ингредиентов и список
+покупок читают базу через асинхронный ORM, так что ожидание базы не
+занимает воркер. Запросы, фильтры, пагинация и сериализаторы берутся
+из наборов представлений DRF. Всё, что асинхронный путь не обрабатывает
+(изменяющие методы, неверный токен, курсорная пагинация, ошибки,
+browsable API), передаётся синхронному представлению, поэтому ответы
+не отличаются от синхронного развёртывания.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .authentication import token_cache
+from .relations import load_relations
+from .tags import aget_tag_registry
+from .utils import SHOPPING_CART_FORMATS, get_shopping_cart
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+
+async def authenticate(request):
+    """Пользователь и токен по заголовку Authorization, как у DRF.
+
+    Сначала смотрит в token_cache, как CachedTokenAuthentication. None —
+    если токен неверный или пользователь неактивен: ошибку вернёт
+    синхронное представление.
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    keyword = TokenAuthentication.keyword.lower()
+    if not header or header[0].lower() != keyword:
+        return AnonymousUser(), None
+    if len(header) != 2:
+        return None
+    credentials = token_cache.get(header[1])
+    if credentials is not None:
+        return credentials
+    token = await Token.objects.select_related('user').filter(
+        key=header[1]
+    ).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    token_cache.set(header[1], token.user, token)
+    return token.user, token
+
+
+def render(data):
+    response = HttpResponse(
+        JSONRenderer().render(data), content_type='application/json'
+    )
+    patch_vary_headers(response, ('Accept', ))
+    return response
+
+
+async def iterate(parts):
+    for part in parts:
+        yield part
+
+
+async def preload(request):
+    """Кэш связей и реестр тегов читаются из базы: загружаются заранее."""
+    await aget_tag_registry(request)
+    if request.user.is_authenticated:
+        await sync_to_async(load_relations)(request)
+
+
+async def recipe_list(view):
+    paginator = view.paginator
+    if paginator.get_cursor_paginator(view.request, view) is not None:
+        return None
+    key = None
+    if view.use_cache(view.request):
+        key, data = await sync_to_async(view.get_cached)(view.request)
+        if data is not None:
+            response = render(data)
+            response['X-Cache'] = 'HIT'
+            return response
+    # После загрузки реестра тегов фильтры не обращаются к базе.
+    await preload(view.request)
+    queryset = view.filter_queryset(view.get_queryset())
+    page = await paginator.apaginate_queryset(queryset, view.request, view)
+    data = paginator.get_paginated_response(
+        view.get_serializer(page, many=True).data
+    ).data
+    response = render(data)
+    if key is not None:
+        await cache.aset(key, data, settings.RECIPE_FEED_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+async def recipe_detail(view):
+    recipe = await view.get_queryset().filter(
+        pk=view.kwargs['pk']
+    ).afirst()
+    if recipe is None:
+        return None
+    view.check_object_permissions(view.request, recipe)
+    await preload(view.request)
+    return render(view.get_serializer(recipe).data)
+
+
+async def plain_list(view):
+    queryset = view.filter_queryset(view.get_queryset())
+    objects = [obj async for obj in queryset]
+    return render(view.get_serializer(objects, many=True).data)
+
+
+async def ingredient_list(view):
+    data = view.search_catalog(view.request)
+    if data is None:
+        return await plain_list(view)
+    return render(data)
+
+
+async def tag_list(view):
+    return render((await aget_tag_registry(view.request)).as_list())
+
+
+async def shopping_cart(view):
+    file_format = view.request.query_params.get('file_format', 'txt')
+    if file_format not in SHOPPING_CART_FORMATS:
+        return None
+    export, content_type = SHOPPING_CART_FORMATS[file_format]
+    user = view.request.user
+    rows = [row async for row in get_shopping_cart(user)]
+    response = StreamingHttpResponse(
+        iterate(export(user, rows)), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        'attachment; filename="shopping_list.%s"' % file_format
+    )
+    return response
+
+
+def prefers_html(request):
+    return (
+        'format' in request.GET
+        or 'text/html' in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+def async_read(viewset, actions, handler, **initkwargs):
+    """Представление: GET отдаёт handler, остальное — набор viewset.
+
+    actions и initkwargs те же, что роутер DRF передаёт в as_view;
+    handler получает подготовленный экземпляр viewset и возвращает
+    ответ или None, чтобы запрос обработало синхронное представление.
+    """
+    action = actions['get']
+    initkwargs = {
+        **getattr(getattr(viewset, action), 'kwargs', {}), **initkwargs
+    }
+    fallback = sync_to_async(viewset.as_view(actions, **initkwargs))
+
+    async def handle(request, kwargs):
+        credentials = await authenticate(request)
+        if credentials is None:
+            return None
+        drf_request = Request(request)
+        drf_request.user, drf_request.auth = credentials
+        request.action = action
+        view = viewset(
+            action=action, request=drf_request, args=(), kwargs=kwargs,
+            format_kwarg=None, **initkwargs
+        )
+        try:
+            view.check_permissions(drf_request)
+            drf_request.accepted_renderer, drf_request.accepted_media_type = (
+                view.perform_content_negotiation(drf_request)
+            )
+            response = view.get_not_modified(drf_request)
+            if response is None:
+                response = await handler(view)
+        except APIException:
+            return None
+        return response and view.add_validators(response)
+
+    async def async_view(request, *args, **kwargs):
+        response = None
+        if request.method == 'GET' and not prefers_html(request):
+            response = await handle(request, kwargs)
+        if response is None:
+            response = await fallback(request, *args, **kwargs)
+        return response
+
+    async_view.csrf_exempt = True
+    return async_view
+
+
+recipes = async_read(
+    RecipeViewSet, {'get': 'list', 'post': 'create'}, recipe_list,
+    basename='recipes', detail=False,
+)
+recipe = async_read(
+    RecipeViewSet,
+    {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    },
+    recipe_detail,
+    basename='recipes', detail=True,
+)
+download_shopping_cart = async_read(
+    RecipeViewSet, {'get': 'download_shopping_cart'}, shopping_cart,
+    basename='recipes', detail=False,
+)
+tags = async_read(
+    TagViewSet, {'get': 'list'}, tag_list, basename='tags', detail=False,
+)
+ingredients = async_read(
+    IngredientViewSet, {'get': 'list'}, ingredient_list,
+    basename='ingredients', detail=False,
+)
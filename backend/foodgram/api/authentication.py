@@ -0,0 +1,160 @@
+"""Аутентификация по токену DRF с кэшем токен -> пользователь.
+
+TokenAuthentication ищет токен в базе на каждом запросе. Здесь
+найденные пары хранятся в ограниченном LRU-кэше процесса со сроком
+жизни TOKEN_CACHE_TIMEOUT, а с TOKEN_CACHE_SHARED — ещё и в общем кэше
+Django, откуда их берут другие процессы. Запись действительна, пока не
+изменилась версия пользователя (api.cache): её сдвигают удаление токена
+(выход через djoser), сохранение пользователя (смена пароля,
+деактивация) и его удаление. Версии лежат в кэше Django, поэтому кэш
+токенов работает только с общим кэшем (Redis): с кэшем в памяти
+процесса другие процессы не узнали бы о выходе пользователя, и токен
+ищется в базе на каждом запросе (см. api.checks).
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import bump_version, get_version, is_cache_shared
+
+TOKENS = 'tokens'
+
+
+def _user_version_name(user_id):
+    return f'{TOKENS}:{user_id}'
+
+
+def _shared_key(key):
+    return f'{TOKENS}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+class TokenCache:
+    """LRU-кэш токен -> (пользователь, токен) со сроком жизни записей."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.stats = Counter()
+
+    def _local(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            user, token, expires, version = entry
+            if expires > time.monotonic():
+                self.entries.move_to_end(key)
+                return user, token, version
+            del self.entries[key]
+        return None
+
+    def _store(self, key, user, token, version):
+        with self.lock:
+            self.entries[key] = (
+                user, token,
+                time.monotonic() + settings.TOKEN_CACHE_TIMEOUT, version,
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def _count(self, result):
+        with self.lock:
+            self.stats[result] += 1
+
+    def get(self, key):
+        """(пользователь, токен) по ключу токена или None.
+
+        Обращается только к памяти процесса и кэшу Django. Пользователь
+        возвращается копией: изменения в одном запросе не видны другим.
+        Без общего кэша всегда None.
+        """
+        if not is_cache_shared():
+            self._count('miss')
+            return None
+        layer = 'local'
+        entry = self._local(key)
+        if entry is None and settings.TOKEN_CACHE_SHARED:
+            layer = 'shared'
+            entry = cache.get(_shared_key(key))
+        if entry is not None:
+            user, token, version = entry
+            if version == get_version(_user_version_name(user.pk)):
+                if layer == 'shared':
+                    self._store(key, user, token, version)
+                self._count(layer)
+                return copy.copy(user), token
+        self._count('miss')
+        return None
+
+    def set(self, key, user, token):
+        if not is_cache_shared():
+            return
+        version = get_version(_user_version_name(user.pk))
+        self._store(key, user, token, version)
+        if settings.TOKEN_CACHE_SHARED:
+            cache.set(
+                _shared_key(key), (user, token, version),
+                settings.TOKEN_CACHE_TIMEOUT,
+            )
+
+    def invalidate(self, user_id, key=None):
+        """Делает недействительными записи пользователя user_id.
+
+        Версия сдвигается сразу и ещё раз после фиксации транзакции:
+        запрос, успевший прочитать из базы старые данные до фиксации,
+        не сохранит их с новой версией.
+        """
+        def drop():
+            bump_version(_user_version_name(user_id))
+            with self.lock:
+                stale = [
+                    cached for cached, entry in self.entries.items()
+                    if entry[0].pk == user_id
+                ]
+                for cached in stale:
+                    del self.entries[cached]
+            if key is not None:
+                cache.delete(_shared_key(key))
+
+        drop()
+        transaction.on_commit(drop)
+
+    def get_stats(self):
+        with self.lock:
+            stats = {
+                result: self.stats[result]
+                for result in ('local', 'shared', 'miss')
+            }
+            stats['size'] = len(self.entries)
+        lookups = stats['local'] + stats['shared'] + stats['miss']
+        stats['hit_ratio'] = (
+            (stats['local'] + stats['shared']) / lookups if lookups else 0.0
+        )
+        return stats
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.stats.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, который берёт пользователя из token_cache."""
+
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, *credentials)
+        return credentials
@@ -0,0 +1,330 @@
+"""Массовый импорт и экспорт рецептов в формате JSON Lines.
+
+Каждая строка — один рецепт с естественными ключами, не зависящими от
+id конкретной базы:
+
+    {"name": "...", "text": "...", "cooking_time": 10,
+     "author": "username", "image": "recipe/image/... или data:...base64",
+     "tags": ["breakfast"],
+     "ingredients": [{"name": "соль", "measurement_unit": "г",
+                      "amount": 5}]}
+"""
+import json
+import posixpath
+from collections import namedtuple
+from itertools import islice
+from operator import itemgetter
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import F, Prefetch
+from recipe.images import save_original, schedule_renditions
+from recipe.models import AmountIngredient, Ingredient, Recipe, Tag
+from recipe.search import update_search_index
+from user.models import UserStats
+
+from .cache import RECIPES, bump_version
+from .fields import decode_base64_image
+from .matching import record_changes
+from .serializers import ImportRecipeSerializer
+
+User = get_user_model()
+
+IMAGE_DIR = Recipe._meta.get_field('image').upload_to
+
+Row = namedtuple('Row', 'line recipe tags amounts image')
+
+
+class RecordError(ValueError):
+    pass
+
+
+def dump_recipe(recipe):
+    return json.dumps({
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'author': recipe.author.username,
+        'image': recipe.image.name,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'name': amount.ingredients.name,
+                'measurement_unit': amount.ingredients.measurement_unit,
+                'amount': amount.amount,
+            }
+            for amount in recipe.recipe.all()
+        ],
+    }, ensure_ascii=False) + '\n'
+
+
+def export_recipes(queryset=None, chunk_size=2000):
+    """Построчно выдаёт рецепты, держа в памяти не больше chunk_size."""
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    queryset = queryset.select_related('author').prefetch_related(
+        'tags',
+        Prefetch(
+            'recipe',
+            queryset=AmountIngredient.objects.select_related('ingredients'),
+        ),
+    ).order_by('pk')
+    for recipe in queryset.iterator(chunk_size=chunk_size):
+        yield dump_recipe(recipe)
+
+
+def describe_errors(errors, path=''):
+    """Сообщения serializer.errors вида «ingredients.1.amount: ...»."""
+    if isinstance(errors, str):
+        return [f'{path}: {errors}']
+    if isinstance(errors, dict):
+        items = [
+            (f'{path}.{key}' if path else str(key), value)
+            for key, value in errors.items()
+        ]
+    else:
+        items = [
+            (path if isinstance(value, str) else f'{path}.{index}', value)
+            for index, value in enumerate(errors)
+        ]
+    return [
+        message for key, value in items
+        for message in describe_errors(value, key)
+    ]
+
+
+def read_image(value):
+    """Проверенный путь в хранилище или data URI как есть.
+
+    Путь принимается только относительный, внутри каталога изображений
+    рецептов и к уже существующему файлу. data URI декодируется позже,
+    при сохранении строки (store_image).
+    """
+    if value.startswith('data:'):
+        return value
+    name = posixpath.normpath(value)
+    if (name != value or not name.startswith(f'{IMAGE_DIR}/')
+            or not default_storage.exists(name)):
+        raise RecordError(f'Изображение не найдено: {value}')
+    return name
+
+
+def store_image(value):
+    """Имя файла в хранилище.
+
+    data URI декодируется во временный файл, который записывается и
+    сразу закрывается.
+    """
+    if not value.startswith('data:'):
+        return value
+    try:
+        file = decode_base64_image(value)
+    except ValueError as error:
+        raise RecordError(f'Некорректное изображение: {error}')
+    with file:
+        return save_original(file)
+
+
+class RecipeImporter:
+    """Импортирует рецепты пачками: одна транзакция на chunk_size строк.
+
+    Теги, ингредиенты, авторы и уже существующие названия разрешаются
+    одним запросом на пачку; ошибки копятся по номерам строк и не
+    прерывают импорт остальных рецептов. Изображения из base64
+    записываются по одному перед вставкой пачки; файлы строк, которые
+    отвергла база, удаляются, если на них не ссылается другой рецепт.
+    """
+
+    def __init__(self, author=None, chunk_size=500):
+        self.author = author
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.errors = []
+
+    def report(self):
+        return {
+            'created': self.created,
+            'errors': sorted(self.errors, key=itemgetter('line')),
+        }
+
+    def run(self, lines):
+        numbered = enumerate(lines, start=1)
+        while True:
+            chunk = list(islice(numbered, self.chunk_size))
+            if not chunk:
+                return self.report()
+            self.import_chunk(self.parse(chunk))
+
+    def parse(self, chunk):
+        records = []
+        for number, line in chunk:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            try:
+                records.append((number, self.validate(json.loads(line))))
+            except ValueError as error:
+                self.errors.append({'line': number, 'error': str(error)})
+        return records
+
+    def validate(self, record):
+        if not isinstance(record, dict):
+            raise RecordError('Ожидается JSON-объект.')
+        serializer = ImportRecipeSerializer(data=record)
+        if not serializer.is_valid():
+            raise RecordError('; '.join(describe_errors(serializer.errors)))
+        return serializer.validated_data
+
+    def load_lookups(self, records):
+        names = {
+            item['name']
+            for _, record in records for item in record['ingredients']
+        }
+        self.ingredients = {
+            (ingredient.name, ingredient.measurement_unit): ingredient.pk
+            for ingredient in Ingredient.objects.filter(name__in=names)
+        }
+        self.tags = Tag.objects.in_bulk(
+            {slug for _, record in records for slug in record.get('tags', [])},
+            field_name='slug',
+        )
+        self.authors = User.objects.in_bulk(
+            {record['author'] for _, record in records if 'author' in record},
+            field_name='username',
+        )
+        self.existing = set(Recipe.objects.filter(
+            name__in=[record['name'] for _, record in records]
+        ).values_list('name', flat=True))
+
+    def build(self, number, record):
+        if record['name'] in self.existing:
+            raise RecordError(f'Рецепт «{record["name"]}» уже существует.')
+        author = self.authors.get(record.get('author'), self.author)
+        if author is None:
+            raise RecordError('Автор не найден.')
+        unknown_tags = set(record.get('tags', [])) - set(self.tags)
+        if unknown_tags:
+            raise RecordError(f'Теги не найдены: {sorted(unknown_tags)}')
+        amounts = self.build_amounts(record['ingredients'])
+        recipe = Recipe(
+            author=author,
+            name=record['name'],
+            text=record['text'],
+            cooking_time=record['cooking_time'],
+        )
+        return Row(
+            number, recipe, record.get('tags', []), amounts,
+            read_image(record['image']),
+        )
+
+    def build_amounts(self, ingredients):
+        amounts = {}
+        for item in ingredients:
+            key = (item['name'], item['measurement_unit'])
+            if key not in self.ingredients:
+                raise RecordError(f'Ингредиент не найден: {key}')
+            amounts[self.ingredients[key]] = item['amount']
+        return amounts
+
+    def import_chunk(self, records):
+        if not records:
+            return
+        self.load_lookups(records)
+        self.rejected_images = set()
+        rows = []
+        for number, record in records:
+            try:
+                rows.append(self.build(number, record))
+            except RecordError as error:
+                self.errors.append({'line': number, 'error': str(error)})
+                continue
+            self.existing.add(record['name'])
+        if rows:
+            self.save_rows(rows)
+        self.discard_images()
+
+    def store_images(self, rows):
+        """Строки, изображения которых записаны в хранилище."""
+        stored = []
+        for row in rows:
+            if not row.recipe.image:
+                try:
+                    row.recipe.image = store_image(row.image)
+                except RecordError as error:
+                    self.errors.append({'line': row.line, 'error': str(error)})
+                    continue
+            stored.append(row)
+        return stored
+
+    def save_rows(self, rows):
+        """Сохраняет пачку; при ошибке базы — по одной строке.
+
+        Так ошибка базы (например, слишком длинное значение в PostgreSQL)
+        попадает в отчёт с номером своей строки.
+        """
+        rows = self.store_images(rows)
+        if not rows:
+            return
+        try:
+            self.save(rows)
+        except (DataError, IntegrityError) as error:
+            if len(rows) > 1:
+                for row in rows:
+                    row.recipe.pk = None
+                    self.save_rows([row])
+            else:
+                self.reject(rows[0], f'Ошибка базы данных: {error}')
+        else:
+            self.created += len(rows)
+
+    def reject(self, row, error):
+        self.errors.append({'line': row.line, 'error': error})
+        if row.image.startswith('data:'):
+            self.rejected_images.add(row.recipe.image.name)
+
+    def discard_images(self):
+        """Удаляет записанные изображения отвергнутых строк пачки."""
+        used = set(Recipe.objects.filter(
+            image__in=self.rejected_images
+        ).values_list('image', flat=True))
+        for name in self.rejected_images - used:
+            default_storage.delete(name)
+
+    @transaction.atomic
+    def save(self, rows):
+        recipes = Recipe.objects.bulk_create(row.recipe for row in rows)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=self.tags[slug].pk)
+            for recipe, row in zip(recipes, rows)
+            for slug in set(row.tags)
+        )
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(
+                recipe_id=recipe.pk, ingredients_id=pk, amount=amount
+            )
+            for recipe, row in zip(recipes, rows)
+            for pk, amount in row.amounts.items()
+        )
+        self.after_save(recipes)
+
+    def after_save(self, recipes):
+        """Заменяет сигналы, которые bulk_create не отправляет."""
+        per_author = {}
+        for recipe in recipes:
+            per_author[recipe.author_id] = (
+                per_author.get(recipe.author_id, 0) + 1
+            )
+        for author_id, count in per_author.items():
+            UserStats.objects.filter(user_id=author_id).update(
+                recipes_count=F('recipes_count') + count
+            )
+        ids = [recipe.pk for recipe in recipes]
+        update_search_index(ids)
+        transaction.on_commit(lambda: record_changes(ids))
+        images = {recipe.image.name for recipe in recipes}
+        transaction.on_commit(lambda: [
+            schedule_renditions(name) for name in images
+        ])
+        transaction.on_commit(lambda: bump_version(RECIPES))
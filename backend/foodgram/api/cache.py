@@ -0,0 +1,133 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from .instrumentation import registry
+
+RECIPES = 'recipes'
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+# Кэши, которые живут в памяти одного процесса и не видны другим.
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+def is_cache_shared():
+    """Общий ли для процессов кэш по умолчанию (Redis, Memcached, БД)."""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def _version_key(name):
+    return f'version:{name}'
+
+
+def _modified_key(name):
+    return f'modified:{name}'
+
+
+def get_version(name):
+    """Текущая версия набора данных name."""
+    return cache.get_or_set(_version_key(name), 1, None)
+
+
+def bump_version(name):
+    """Сдвигает версию name: все ключи со старой версией устаревают.
+
+    Запоминает время изменения для Last-Modified и возвращает новую
+    версию.
+    """
+    cache.set(_modified_key(name), int(time.time()), None)
+    try:
+        return cache.incr(_version_key(name))
+    except ValueError:
+        cache.set(_version_key(name), 2, None)
+        return 2
+
+
+def get_state(names):
+    """Версии наборов names и время последнего изменения любого из них.
+
+    Читается одним get_many; отсутствующие значения заводятся через
+    get_or_set, чтобы не затереть сдвиг версии из другого процесса.
+    """
+    keys = [
+        key for name in names
+        for key in (_version_key(name), _modified_key(name))
+    ]
+    values = cache.get_many(keys)
+    for name in names:
+        if _version_key(name) not in values:
+            values[_version_key(name)] = get_version(name)
+        if _modified_key(name) not in values:
+            values[_modified_key(name)] = cache.get_or_set(
+                _modified_key(name), int(time.time()), None
+            )
+    versions = [values[_version_key(name)] for name in names]
+    return versions, max(values[_modified_key(name)] for name in names)
+
+
+def get_stats(prefix):
+    """Попадания и промахи кэша prefix в этом процессе."""
+    return {
+        'hits': registry.cache[prefix, 'hits'],
+        'misses': registry.cache[prefix, 'misses'],
+    }
+
+
+def get_request_key(prefix, request):
+    """Ключ кэша по нормализованной строке запроса и версии данных."""
+    query = sorted(
+        (name, sorted(values))
+        for name, values in request.query_params.lists()
+    )
+    digest = hashlib.md5(
+        repr((request.build_absolute_uri('/'), query)).encode()
+    ).hexdigest()
+    return f'{prefix}:{get_version(prefix)}:{digest}'
+
+
+class AnonymousListCacheMixin:
+    """Кэширует ответ list для анонимных пользователей.
+
+    Для анонима признаки is_favorited/is_in_shopping_cart/is_subscribed
+    всегда ложны, поэтому ответ одинаков для всех и его можно отдавать
+    из кэша. Заголовок X-Cache-Bypass отключает кэш для отладки. Версия
+    сдвигается и в других процессах (команды импорта), поэтому кэш
+    работает только при общем кэше Django.
+    """
+    cache_prefix = RECIPES
+    cache_bypass_header = 'HTTP_X_CACHE_BYPASS'
+
+    def use_cache(self, request):
+        return is_cache_shared() and not (
+            request.user.is_authenticated
+            or request.META.get(self.cache_bypass_header)
+        )
+
+    def get_cached(self, request):
+        """Ключ кэша для запроса и данные по нему (None — промах)."""
+        key = get_request_key(self.cache_prefix, request)
+        data = cache.get(key)
+        registry.count_cache(
+            self.cache_prefix, 'misses' if data is None else 'hits'
+        )
+        return key, data
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_cache(request):
+            return super().list(request, *args, **kwargs)
+        key, data = self.get_cached(request)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RECIPE_FEED_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,363 @@
+"""Снимок каталога ингредиентов в файле, общий для всех воркеров.
+
+build_catalog записывает recipe.Ingredient в двоичный файл: заголовок,
+массивы id, смещений названий и порядка сортировки, затем сами строки
+в UTF-8. Файл открывается через mmap, и массивы читаются прямо из
+страниц файла (numpy.frombuffer), поэтому все воркеры делят одну копию
+в кэше страниц ОС и память не растёт с их числом.
+
+Новый снимок пишется во временный файл и подменяется os.replace:
+воркер замечает новый файл по stat и открывает его, а запросы до этого
+дочитывают старый, отображение которого остаётся действительным.
+Рядом лежит сжатая копия (.gz), которую клиенты скачивают для
+автодополнения без сети.
+
+Формат (little-endian): заголовок HEADER, затем
+ids int32[n] — id по возрастанию, строки каталога в этом же порядке;
+units uint32[n] — номер единицы измерения строки;
+name_offsets uint32[n + 1] — границы названий в блоке names;
+order uint32[n] — строки по возрастанию ключа поиска;
+ranks uint32[n] — место строки при сортировке по названию;
+key_offsets uint32[n + 1] — начала ключей в блоке keys;
+unit_offsets uint32[u + 1] — границы единиц в блоке units;
+блоки names, keys (casefold названий в порядке order, каждый с '\\n')
+и units.
+"""
+import gzip
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from recipe.models import Ingredient
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from .filters import CustomIngredientsSearchFilter
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FGIC'
+FORMAT = 1
+HEADER = struct.Struct('<4sHHIIQQ')
+SEPARATOR = b'\n'
+
+
+def _offsets(blobs):
+    offsets = np.zeros(len(blobs) + 1, dtype='<u4')
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+    return offsets
+
+
+def _read_version(path):
+    try:
+        with open(path, 'rb') as file:
+            magic, _, _, _, _, version, _ = HEADER.unpack(
+                file.read(HEADER.size)
+            )
+    except (OSError, struct.error):
+        return 0
+    return version if magic == MAGIC else 0
+
+
+def _replace(source, path):
+    with open(source, 'rb') as file:
+        os.fsync(file.fileno())
+    os.replace(source, path)
+
+
+def build_catalog(path=None):
+    """Записывает снимок каталога в path, возвращает (версия, строк)."""
+    path = path or settings.INGREDIENT_CATALOG_PATH
+    rows = list(Ingredient.objects.order_by('pk').values_list(
+        'pk', 'name', 'measurement_unit'
+    ).iterator(chunk_size=10000))
+    units = sorted({unit for _, _, unit in rows})
+    unit_numbers = {unit: number for number, unit in enumerate(units)}
+    names = [name.encode() for _, name, _ in rows]
+    keys = [name.casefold().encode() + SEPARATOR for _, name, _ in rows]
+    order = sorted(range(len(rows)), key=lambda row: (keys[row], names[row]))
+    ranks = np.empty(len(rows), dtype='<u4')
+    ranks[sorted(range(len(rows)), key=names.__getitem__)] = np.arange(
+        len(rows)
+    )
+    keys = [keys[row] for row in order]
+    units = [unit.encode() for unit in units]
+    version = _read_version(path) + 1
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as file:
+        file.write(HEADER.pack(
+            MAGIC, FORMAT, 0, len(rows), len(units), version,
+            int(time.time()),
+        ))
+        for array in (
+            np.array([pk for pk, _, _ in rows], dtype='<i4'),
+            np.array(
+                [unit_numbers[unit] for _, _, unit in rows], dtype='<u4'
+            ),
+            _offsets(names),
+            np.array(order, dtype='<u4'),
+            ranks,
+            _offsets(keys),
+            _offsets(units),
+        ):
+            file.write(array.tobytes())
+        for blobs in (names, keys, units):
+            file.write(b''.join(blobs))
+    with open(file.name, 'rb') as source, tempfile.NamedTemporaryFile(
+        dir=directory, delete=False
+    ) as compressed:
+        with gzip.GzipFile(fileobj=compressed, mode='wb', mtime=0) as output:
+            shutil.copyfileobj(source, output)
+    _replace(compressed.name, f'{path}.gz')
+    _replace(file.name, path)
+    return version, len(rows)
+
+
+class IngredientCatalog:
+    """Снимок каталога, открытый через mmap."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            self.buffer = mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        self.key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        (magic, file_format, _, count, unit_count, self.version,
+         self.built) = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or file_format != FORMAT:
+            raise ValueError(f'Неизвестный формат снимка: {path}')
+        self.offset = HEADER.size
+        self.ids = self._array('<i4', count)
+        self.units = self._array('<u4', count)
+        self.name_offsets = self._array('<u4', count + 1)
+        self.order = self._array('<u4', count)
+        self.ranks = self._array('<u4', count)
+        self.key_offsets = self._array('<u4', count + 1)
+        self.unit_offsets = self._array('<u4', unit_count + 1)
+        self.names_start = self.offset
+        self.keys_start = self.names_start + int(self.name_offsets[-1])
+        self.units_start = self.keys_start + int(self.key_offsets[-1])
+        self.keys = np.frombuffer(
+            self.buffer, dtype='u1', count=int(self.key_offsets[-1]),
+            offset=self.keys_start,
+        )
+
+    def _array(self, dtype, count):
+        array = np.frombuffer(
+            self.buffer, dtype=dtype, count=count, offset=self.offset
+        )
+        self.offset += array.nbytes
+        return array
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _text(self, start, offsets, number):
+        return self.buffer[
+            start + int(offsets[number]):start + int(offsets[number + 1])
+        ].decode()
+
+    def row(self, row):
+        return {
+            'id': int(self.ids[row]),
+            'name': self._text(self.names_start, self.name_offsets, row),
+            'measurement_unit': self._text(
+                self.units_start, self.unit_offsets, int(self.units[row])
+            ),
+        }
+
+    def get(self, pk):
+        """Ингредиент pk или None."""
+        row = int(np.searchsorted(self.ids, pk))
+        if row < len(self.ids) and self.ids[row] == pk:
+            return self.row(row)
+        return None
+
+    def all(self):
+        return [self.row(row) for row in range(len(self))]
+
+    def _key(self, position):
+        start = self.keys_start + int(self.key_offsets[position])
+        end = self.keys_start + int(self.key_offsets[position + 1]) - 1
+        return self.buffer[start:end]
+
+    def _lower_bound(self, key):
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _contains(self, key):
+        """Номера ключей (в порядке order), содержащих key."""
+        found = np.flatnonzero(self.keys[:len(self.keys) - len(key) + 1]
+                               == key[0])
+        for shift, byte in enumerate(key[1:], 1):
+            found = found[self.keys[found + shift] == byte]
+        return np.unique(
+            np.searchsorted(self.key_offsets, found, 'right') - 1
+        )
+
+    def _first(self, rows, limit):
+        return rows[np.argsort(self.ranks[rows], kind='stable')[:limit]]
+
+    def search(self, term, limit):
+        """Как CustomIngredientsSearchFilter: сначала начинающиеся с term.
+
+        Ключи отсортированы, поэтому начинающиеся с term лежат подряд и
+        находятся двоичным поиском. Остальные совпадения ищутся по
+        блоку ключей средствами numpy. Внутри групп порядок по названию,
+        как order_by('name') при побайтовом сравнении строк.
+        """
+        key = term.casefold().encode().replace(SEPARATOR, b'')
+        start = self._lower_bound(key)
+        end = self._lower_bound(key + b'\xff')
+        found = self._first(self.order[start:end], limit)
+        if len(found) < limit:
+            numbers = self._contains(key)
+            numbers = numbers[(numbers < start) | (numbers >= end)]
+            found = np.concatenate((found, self._first(
+                self.order[numbers], limit - len(found)
+            )))
+        return [self.row(int(row)) for row in found]
+
+
+class CatalogHolder:
+    """Текущий снимок процесса, переоткрываемый при замене файла."""
+
+    def __init__(self):
+        self.catalog = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        """Снимок или None, если файла нет: тогда отвечает база.
+
+        Пока один поток открывает новый файл, остальные не ждут его и
+        отвечают по старому снимку.
+        """
+        catalog = self.catalog
+        try:
+            stat = os.stat(settings.INGREDIENT_CATALOG_PATH)
+        except OSError:
+            return None
+        if catalog is not None and catalog.key == (
+            stat.st_ino, stat.st_mtime_ns, stat.st_size
+        ):
+            return catalog
+        if not self.lock.acquire(blocking=False):
+            return catalog
+        try:
+            self.catalog = IngredientCatalog(
+                settings.INGREDIENT_CATALOG_PATH
+            )
+        except (OSError, ValueError):
+            logger.exception('Не удалось открыть снимок каталога')
+        finally:
+            self.lock.release()
+        return self.catalog
+
+
+ingredient_catalog = CatalogHolder()
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='catalog')
+_pending = threading.Event()
+
+
+def _rebuild():
+    _pending.clear()
+    try:
+        build_catalog()
+    except Exception:
+        logger.exception('Не удалось пересобрать снимок каталога')
+
+
+def schedule_rebuild():
+    """После фиксации пересобирает существующий снимок вне запроса.
+
+    Изменения, пришедшие во время сборки, собираются одной следующей.
+    """
+    def submit():
+        if _pending.is_set():
+            return
+        _pending.set()
+        _executor.submit(_rebuild)
+
+    if os.path.exists(settings.INGREDIENT_CATALOG_PATH):
+        transaction.on_commit(submit)
+
+
+def download_response(request):
+    """Ответ со сжатым снимком (Content-Encoding: gzip) или 304.
+
+    ETag берётся из stat открытого файла, поэтому соответствует
+    отдаваемым байтам, даже если снимок тут же заменят.
+    """
+    try:
+        file = open(f'{settings.INGREDIENT_CATALOG_PATH}.gz', 'rb')
+    except FileNotFoundError:
+        raise NotFound('Снимок каталога ещё не собран.')
+    stat = os.fstat(file.fileno())
+    etag = f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    response = get_conditional_response(request, etag, int(stat.st_mtime))
+    if response is None:
+        response = FileResponse(
+            file, as_attachment=True, filename='ingredients.bin',
+            content_type='application/octet-stream',
+        )
+        response['Content-Encoding'] = 'gzip'
+    else:
+        file.close()
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+class IngredientCatalogMixin:
+    """list и retrieve ингредиентов из снимка, пока он есть."""
+
+    def search_catalog(self, request):
+        """Данные ответа list из снимка или None."""
+        catalog = ingredient_catalog.get()
+        if catalog is None:
+            return None
+        search = CustomIngredientsSearchFilter()
+        name = request.query_params.get(search.search_param, '').strip()
+        if not name:
+            return catalog.all()
+        return catalog.search(name, search.get_limit(request))
+
+    def get_extra_state(self):
+        catalog = ingredient_catalog.get()
+        if catalog is None:
+            return None, 0
+        return catalog.version, catalog.built
+
+    def list(self, request, *args, **kwargs):
+        data = self.search_catalog(request)
+        if data is None:
+            return super().list(request, *args, **kwargs)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        catalog = ingredient_catalog.get()
+        pk = str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        data = catalog and pk.isdigit() and catalog.get(int(pk))
+        if not data:
+            return super().retrieve(request, *args, **kwargs)
+        return Response(data)
@@ -0,0 +1,28 @@
+from django.core.checks import Tags, Warning, register
+
+from .cache import is_cache_shared
+
+# Что отключается, если кэш по умолчанию не общий для процессов.
+DISABLED_WITHOUT_SHARED_CACHE = (
+    'кэш токенов: токен ищется в базе на каждом запросе',
+    'реестр тегов: теги читаются из базы на каждом запросе',
+    'кэш избранного, списка покупок и подписок: id читаются из базы на '
+    'каждом запросе',
+    'ETag и Last-Modified: ответы не перепроверяются и не хранятся в nginx',
+    'кэш анонимной ленты рецептов',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Кэши процессов и версии данных требуют общего кэша."""
+    if is_cache_shared():
+        return []
+    return [Warning(
+        'Кэш по умолчанию хранится в памяти процесса.',
+        hint=(
+            'Отключены ' + '; '.join(DISABLED_WITHOUT_SHARED_CACHE)
+            + '. Задайте CACHE_BACKEND, например RedisCache.'
+        ),
+        id='api.W001',
+    )]
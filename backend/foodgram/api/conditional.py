@@ -0,0 +1,92 @@
+"""Условные GET-запросы: ETag и Last-Modified по версиям данных.
+
+Версии (api.cache) сдвигаются при каждой записи в наборы данных, поэтому
+валидаторы вычисляются по нескольким ключам кэша, без запросов к базе,
+и совпадают у всех процессов и у nginx, который перепроверяет по ним
+закэшированные ответы (proxy_cache_revalidate). Совпадают они только при
+общем кэше: с кэшем в памяти процесса другой процесс ответил бы 304 на
+устаревшие данные, поэтому валидаторы не выдаются, а nginx без ETag
+ответ не хранит.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .cache import RECIPES, get_state, is_cache_shared
+from .relations import relation_versions
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для list и retrieve по версиям данных.
+
+    Валидаторы строятся из адреса запроса, формата ответа и версий
+    наборов conditional_versions, а для авторизованного пользователя —
+    ещё из его id и версий его связей (api.relations). Совпавший
+    If-None-Match или If-Modified-Since даёт 304 до выполнения запроса
+    к базе и сериализатора.
+    """
+    conditional_versions = (RECIPES, )
+    conditional_actions = ('list', 'retrieve')
+    validators = None
+
+    def get_validators(self, request):
+        """(ETag, Last-Modified) для запроса или None."""
+        if (request.method not in ('GET', 'HEAD')
+                or self.action not in self.conditional_actions
+                or not is_cache_shared()):
+            return None
+        names = list(self.conditional_versions)
+        user_id = None
+        if request.user.is_authenticated:
+            user_id = request.user.pk
+            names += relation_versions(user_id)
+        versions, last_modified = get_state(names)
+        extra, modified = self.get_extra_state()
+        renderer = getattr(request, 'accepted_renderer', None)
+        digest = hashlib.md5(repr((
+            request.get_full_path(),
+            renderer and renderer.format,
+            user_id,
+            versions,
+            extra,
+        )).encode()).hexdigest()
+        return f'W/"{digest}"', max(last_modified, modified)
+
+    def get_extra_state(self):
+        """(Ключ, время изменения) данных, не описанных версиями."""
+        return None, 0
+
+    def get_not_modified(self, request):
+        """Ответ 304 (412), если у клиента актуальная версия, иначе None."""
+        self.validators = self.get_validators(request)
+        if self.validators is None:
+            return None
+        response = get_conditional_response(request, *self.validators)
+        if response is not None:
+            self.add_validators(response)
+        return response
+
+    def add_validators(self, response):
+        if self.validators is None or response.status_code not in (200, 304):
+            return response
+        etag, last_modified = self.validators
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        if self.request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    def conditional(self, handler, request, *args, **kwargs):
+        response = self.get_not_modified(request)
+        if response is None:
+            response = self.add_validators(handler(request, *args, **kwargs))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
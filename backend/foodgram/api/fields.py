@@ -0,0 +1,57 @@
+import base64
+from tempfile import TemporaryFile
+
+from django.core.files import File
+from recipe.images import verify_image
+from rest_framework import serializers
+
+# Размер куска строки base64 при декодировании.
+DECODE_CHUNK = 4 * 65536
+
+
+def decode_base64_image(data):
+    """Декодирует изображение в base64 (можно data URI) во временный файл.
+
+    Строка читается кусками без полной копии. Пробельные символы, в том
+    числе переносы строк, пропускаются. Изображение проверяется, но в
+    хранилище не записывается. Бросает ValueError.
+    """
+    start = data.find(';base64,', 0, 100)
+    start = 0 if start < 0 else start + len(';base64,')
+    file = TemporaryFile()
+    try:
+        rest = ''
+        for pos in range(start, len(data), DECODE_CHUNK):
+            chunk = rest + ''.join(data[pos:pos + DECODE_CHUNK].split())
+            size = len(chunk) - len(chunk) % 4
+            file.write(base64.b64decode(chunk[:size], validate=True))
+            rest = chunk[size:]
+        if rest:
+            file.write(base64.b64decode(rest, validate=True))
+        verify_image(file)
+    except ValueError:
+        file.close()
+        raise
+    return File(file, name='upload')
+
+
+class Base64ImageField(serializers.ImageField):
+    """Изображение в base64 с потоковым декодированием во временный файл.
+
+    Значение поля — проверенный временный файл. В хранилище его
+    записывает сериализатор в create/update (recipe.images.save_original)
+    под именем из хэша содержимого, поэтому запрос, не прошедший
+    проверку, файлов не оставляет, а повторная загрузка того же
+    изображения не создаёт копию.
+    """
+    default_error_messages = {
+        'invalid_image': 'Загрузите корректное изображение.',
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            return super().to_internal_value(data)
+        try:
+            return decode_base64_image(data)
+        except ValueError:
+            self.fail('invalid_image')
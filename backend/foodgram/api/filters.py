@@ -1,8 +1,12 @@
 from distutils.util import strtobool
 
+from django.db.models import Case, IntegerField, Value, When
 from django_filters import rest_framework
-from recipe.models import FavoriteRecipe, Recipe, ShoppingList, Tag
-from rest_framework.filters import SearchFilter
+from recipe.models import Recipe
+from recipe.search import search_recipes
+from rest_framework.filters import BaseFilterBackend
+
+from .tags import get_tag_registry
 
 CHOICES_VALUE = (
     ('0', 'False'),
@@ -10,16 +14,39 @@ CHOICES_VALUE = (
 )
 
 
-class CustomIngredientsSearchFilter(SearchFilter):
+class CustomIngredientsSearchFilter(BaseFilterBackend):
+    """Поиск ингредиентов для автодополнения.
+
+    Совпадения с начала названия выводятся выше совпадений в середине,
+    количество результатов ограничено параметром limit.
+    """
     search_param = 'name'
+    limit_param = 'limit'
+    default_limit = 50
+    max_limit = 200
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name:
+            return queryset
+        return queryset.filter(name__icontains=name).annotate(
+            is_prefix=Case(
+                When(name__istartswith=name, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('is_prefix', 'name')[:self.get_limit(request)]
 
 
 class RecipeFilter(rest_framework.FilterSet):
-    tags = rest_framework.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
-    )
+    tags = rest_framework.MultipleChoiceFilter(method='filter_tags')
     is_favorited = rest_framework.ChoiceFilter(
         choices=CHOICES_VALUE,
         method='get_is_favorited'
@@ -32,28 +59,48 @@ class RecipeFilter(rest_framework.FilterSet):
         field_name='author',
         lookup_expr='exact'
     )
+    search = rest_framework.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.filters['tags'].extra['choices'] = get_tag_registry(
+            self.request
+        ).choices
+
+    def filter_tags(self, queryset, name, value):
+        """Рецепты с любым из тегов; slug проверены по реестру тегов."""
+        by_slug = get_tag_registry(self.request).by_slug
+        return queryset.filter(
+            tags__in=[by_slug[slug] for slug in value]
+        ).distinct()
+
+    def filter_user_flag(self, queryset, name, value):
+        """Фильтр по признаку, вычисленному подзапросом Exists.
+
+        Отбор идёт в базе, чтобы пагинация видела итоговый набор: список
+        id из кэша связей может быть слишком длинным для IN. Признак
+        аннотируется RecipeQuerySet.with_user_flags, и сериализатор берёт
+        значение из той же строки.
+        """
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.none() if strtobool(value) else queryset
+        if name not in queryset.query.annotations:
+            queryset = queryset.with_user_flags(user)
+        return queryset.filter(**{name: bool(strtobool(value))})
+
+    def filter_search(self, queryset, name, value):
+        """Поиск по названию, описанию и ингредиентам с ранжированием."""
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
     def get_is_favorited(self, queryset, name, value):
-        if self.request.user.is_anonymous:
-            return Recipe.objects.none()
-        favorites_recipe = FavoriteRecipe.objects.filter(
-            user=self.request.user)
-        recipes = [val.recipe.id for val in favorites_recipe]
-        new_queryset = queryset.filter(id__in=recipes)
-        if not strtobool(value):
-            return queryset.difference(new_queryset)
-        return queryset.filter(id__in=recipes)
+        return self.filter_user_flag(queryset, 'is_favorited', value)
 
     def get_is_in_shopping_cart(self, queryset, name, value):
-        if self.request.user.is_anonymous:
-            return Recipe.objects.none()
-        shopping_cart = ShoppingList.objects.filter(user=self.request.user)
-        recipes = [val.recipe.id for val in shopping_cart]
-        new_queryset = queryset.filter(id__in=recipes)
-        if not strtobool(value):
-            return queryset.difference(new_queryset)
-        return queryset.filter(id__in=recipes)
+        return self.filter_user_flag(queryset, 'is_in_shopping_cart', value)
@@ -0,0 +1,289 @@
+"""Замеры запросов: общее время, время и число SQL-запросов, сериализация.
+
+InstrumentationMiddleware считает время каждого запроса, а для доли
+запросов (INSTRUMENTATION_SAMPLE_RATE или заголовок X-Instrumentation)
+дополнительно перехватывает SQL: время, число запросов и повторы
+одинаковых запросов — признак N+1. Время сериализации добавляет
+InstrumentedViewMixin. Результат отдаётся в заголовке Server-Timing,
+пишется в лог foodgram.requests одной JSON-строкой и накапливается
+в метриках процесса (render_metrics, формат Prometheus).
+
+Под ASGI запросы к базе выполняются в потоке запроса (sync_to_async),
+поэтому перехватчик SQL ставится на соединение этого потока.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('foodgram.requests')
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+DUPLICATE_THRESHOLD = 3
+FORCE_HEADER = 'HTTP_X_INSTRUMENTATION'
+PLACEHOLDERS = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+def fingerprint(sql):
+    """SQL без значений: списки IN (%s, %s, ...) сводятся к одному."""
+    return PLACEHOLDERS.sub('(...)', sql)
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+
+    def __init__(self, sampled):
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.queries = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return {
+            sql: count for sql, count in self.queries.most_common()
+            if count >= DUPLICATE_THRESHOLD
+        }
+
+    def server_timing(self, total):
+        timings = [f'total;dur={total * 1000:.1f}']
+        if self.sampled:
+            timings.append(
+                f'db;dur={self.db_time * 1000:.1f};'
+                f'desc="{sum(self.queries.values())} queries"'
+            )
+            timings.append(f'serializer;dur={self.serializer_time * 1000:.1f}')
+        return ', '.join(timings)
+
+
+class Registry:
+    """Накопленные метрики процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = defaultdict(lambda: [0] * (len(BUCKETS) + 2))
+        self.sampled = defaultdict(lambda: [0, 0, 0.0, 0, 0.0])
+        self.cache = Counter()
+
+    def count_cache(self, prefix, result):
+        """Попадание (hits) или промах (misses) кэша ответов prefix."""
+        with self.lock:
+            self.cache[prefix, result] += 1
+
+    def observe(self, view, method, status, total, metrics):
+        with self.lock:
+            histogram = self.requests[view, method, f'{status // 100}xx']
+            for position, bound in enumerate(BUCKETS):
+                if total <= bound:
+                    histogram[position] += 1
+            histogram[-2] += 1
+            histogram[-1] += total
+            if metrics.sampled:
+                sampled = self.sampled[view]
+                sampled[0] += 1
+                sampled[1] += sum(metrics.queries.values())
+                sampled[2] += metrics.db_time
+                sampled[3] += sum(metrics.duplicates.values())
+                sampled[4] += metrics.serializer_time
+
+
+registry = Registry()
+
+
+def _labels(**labels):
+    return '{%s}' % ','.join(
+        f'{name}="{value}"' for name, value in labels.items()
+    )
+
+
+def _histogram_lines(requests):
+    yield '# HELP foodgram_request_duration_seconds Время ответа.'
+    yield '# TYPE foodgram_request_duration_seconds histogram'
+    for (view, method, status), histogram in sorted(requests.items()):
+        labels = dict(view=view, method=method, status=status)
+        for bound, count in zip(BUCKETS, histogram):
+            yield 'foodgram_request_duration_seconds_bucket%s %d' % (
+                _labels(**labels, le=bound), count
+            )
+        yield 'foodgram_request_duration_seconds_bucket%s %d' % (
+            _labels(**labels, le='+Inf'), histogram[-2]
+        )
+        yield 'foodgram_request_duration_seconds_count%s %d' % (
+            _labels(**labels), histogram[-2]
+        )
+        yield 'foodgram_request_duration_seconds_sum%s %.6f' % (
+            _labels(**labels), histogram[-1]
+        )
+
+
+SAMPLED_METRICS = (
+    ('foodgram_sampled_requests_total', 'Запросов с замером SQL.'),
+    ('foodgram_db_queries_total', 'SQL-запросов в замеренных запросах.'),
+    ('foodgram_db_duration_seconds_total', 'Время SQL в замеренных.'),
+    ('foodgram_duplicate_queries_total', 'Повторов одинакового SQL.'),
+    ('foodgram_serializer_duration_seconds_total', 'Время сериализации.'),
+)
+
+
+def render_metrics(extra=()):
+    """Метрики процесса в текстовом формате Prometheus.
+
+    extra — дополнительные счётчики (name, labels, value).
+    """
+    with registry.lock:
+        requests = {
+            key: list(value) for key, value in registry.requests.items()
+        }
+        sampled = {
+            key: list(value) for key, value in registry.sampled.items()
+        }
+    lines = list(_histogram_lines(requests))
+    for position, (name, description) in enumerate(SAMPLED_METRICS):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        for view, values in sorted(sampled.items()):
+            lines.append(f'{name}{_labels(view=view)} {values[position]:g}')
+    typed = set()
+    for name, labels, value in extra:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name}{_labels(**labels)} {value:g}')
+    return '\n'.join(lines) + '\n'
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+def _add_wrapper(metrics):
+    connection.execute_wrappers.append(metrics)
+
+
+def _remove_wrapper(metrics):
+    connection.execute_wrappers.remove(metrics)
+
+
+class InstrumentationMiddleware:
+    """Замеряет запрос и отдаёт результат в Server-Timing, лог и метрики."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        sampled = (
+            random.random() < settings.INSTRUMENTATION_SAMPLE_RATE
+            or FORCE_HEADER in request.META
+        )
+        request.metrics = RequestMetrics(sampled)
+        return request.metrics
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = self.start(request)
+        if metrics.sampled:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = self.start(request)
+        if not metrics.sampled:
+            response = await self.get_response(request)
+            return self.finish(request, response, metrics)
+        await sync_to_async(_add_wrapper)(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_wrapper)(metrics)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        response['Server-Timing'] = metrics.server_timing(total)
+        view = _view_name(request)
+        registry.observe(
+            view, request.method, response.status_code, total, metrics
+        )
+        self.log(request, response, view, total, metrics)
+        return response
+
+    def log(self, request, response, view, total, metrics):
+        slow = total * 1000 >= settings.INSTRUMENTATION_SLOW_MS
+        if not (metrics.sampled or slow):
+            return
+        record = {
+            'view': view,
+            'action': getattr(request, 'action', None),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+        }
+        if metrics.sampled:
+            record.update(
+                db_ms=round(metrics.db_time * 1000, 1),
+                queries=sum(metrics.queries.values()),
+                serializer_ms=round(metrics.serializer_time * 1000, 1),
+                duplicates=metrics.duplicates,
+            )
+        logger.log(
+            logging.WARNING if slow else logging.INFO,
+            json.dumps(record, ensure_ascii=False),
+        )
+
+
+def timed(method, metrics):
+    """method, время работы которого добавляется к сериализации."""
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+    return wrapper
+
+
+class InstrumentedViewMixin:
+    """Добавляет к замерам запроса действие DRF и время сериализации."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        request._request.action = getattr(self, 'action', None)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        metrics = getattr(self.request, 'metrics', None)
+        if metrics is not None and metrics.sampled:
+            serializer.to_representation = timed(
+                serializer.to_representation, metrics
+            )
+        return serializer
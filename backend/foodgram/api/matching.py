@@ -0,0 +1,171 @@
+"""Подбор рецептов по набору ингредиентов, которые есть у пользователя.
+
+Инвертированный индекс ингредиент -> рецепты хранится в памяти процесса
+одним отсортированным массивом ключей (ingredient_id << 32 | recipe_id):
+рецепты одного ингредиента лежат подряд и находятся двоичным поиском.
+Совпадения считаются векторно, без запросов к базе на каждый рецепт.
+
+Изменения состава рецептов записываются в журнал в кэше под номером
+версии COOK; каждый процесс при запросе догоняет журнал и перечитывает
+из базы только изменившиеся рецепты. Если журнал потерян, индекс
+строится заново.
+"""
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from recipe.models import AmountIngredient
+
+from .cache import bump_version, get_version
+
+COOK = 'cook'
+RECIPE_MASK = (1 << 32) - 1
+MAX_CHANGES = 1000
+
+
+def _changes_key(version):
+    return f'{COOK}:changes:{version}'
+
+
+def record_changes(recipe_ids):
+    """Отмечает рецепты, состав которых изменился."""
+    version = bump_version(COOK)
+    cache.set(
+        _changes_key(version), list(recipe_ids),
+        settings.COOK_CHANGES_TIMEOUT
+    )
+
+
+def _load_pairs(recipe_ids=None):
+    """Пары (ингредиент, рецепт) из базы в виде двух массивов."""
+    queryset = AmountIngredient.objects.order_by()
+    if recipe_ids is not None:
+        queryset = queryset.filter(recipe_id__in=recipe_ids)
+    pairs = np.array(
+        list(queryset.values_list('ingredients_id', 'recipe_id').iterator(
+            chunk_size=10000
+        )),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _sorted_unique(keys):
+    """Сортирует ключи и убирает повторы (быстрее np.unique)."""
+    keys = np.sort(keys)
+    if len(keys):
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    return keys
+
+
+class IngredientIndex:
+    """Инвертированный индекс ингредиент -> рецепты."""
+
+    def __init__(self, keys=None, sizes=None):
+        self.keys = np.zeros(0, dtype=np.int64) if keys is None else keys
+        self.sizes = np.zeros(0, dtype=np.int32) if sizes is None else sizes
+
+    @classmethod
+    def from_pairs(cls, ingredients, recipes):
+        keys = _sorted_unique((ingredients << 32) | recipes)
+        sizes = np.bincount(keys & RECIPE_MASK).astype(np.int32)
+        return cls(keys, sizes)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.sizes.nbytes
+
+    def replace(self, recipe_ids, ingredients, recipes):
+        """Новый индекс, где рецепты recipe_ids заменены парами из базы."""
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        keys = self.keys[~np.isin(self.keys & RECIPE_MASK, recipe_ids)]
+        added = _sorted_unique((ingredients << 32) | recipes)
+        keys = np.insert(keys, np.searchsorted(keys, added), added)
+        size = max(
+            len(self.sizes),
+            int(recipe_ids.max()) + 1 if len(recipe_ids) else 0,
+        )
+        sizes = np.zeros(size, dtype=np.int32)
+        sizes[:len(self.sizes)] = self.sizes
+        sizes[recipe_ids] = 0
+        np.add.at(sizes, added & RECIPE_MASK, 1)
+        return IngredientIndex(keys, sizes)
+
+    def match(self, ingredient_ids, max_missing=None):
+        """Рецепты, где есть хотя бы один из ingredient_ids.
+
+        Возвращает массивы id рецептов, доли имеющихся ингредиентов и
+        числа недостающих, отсортированные по убыванию покрытия, затем
+        по возрастанию недостающих и от новых рецептов к старым.
+        """
+        ingredients = _sorted_unique(
+            np.asarray(ingredient_ids, dtype=np.int64)
+        )
+        starts = np.searchsorted(self.keys, ingredients << 32)
+        ends = np.searchsorted(self.keys, (ingredients + 1) << 32)
+        postings = [self.keys[start:end] for start, end in zip(starts, ends)]
+        counts = np.bincount(
+            np.concatenate(postings or [self.keys[:0]]) & RECIPE_MASK,
+            minlength=len(self.sizes),
+        )
+        recipes = np.flatnonzero(counts)
+        found = counts[recipes]
+        total = self.sizes[recipes]
+        if max_missing is not None:
+            selected = total - found <= max_missing
+            recipes, found, total = (
+                recipes[selected], found[selected], total[selected]
+            )
+        missing = total - found
+        # Один ключ сортировки вместо lexsort: покрытие с точностью 2**-20
+        # (точно для рецептов до 1024 ингредиентов), затем число
+        # недостающих и id рецепта в обратном порядке.
+        order = np.argsort(
+            ((1 << 20) - (found << 20) // total) << 42
+            | np.minimum(missing, 1023) << 32
+            | (RECIPE_MASK - recipes)
+        )
+        return recipes[order], (found / total)[order], missing[order]
+
+
+class IndexHolder:
+    """Индекс процесса, синхронизируемый с журналом изменений в кэше."""
+
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        version = get_version(COOK)
+        if self.index is not None and self.version == version:
+            return self.index
+        with self.lock:
+            if self.index is None or self.version != version:
+                self.refresh(version)
+            return self.index
+
+    def refresh(self, version):
+        changed = self.load_changes(version)
+        if changed is None:
+            self.index = IngredientIndex.from_pairs(*_load_pairs())
+        elif changed:
+            self.index = self.index.replace(changed, *_load_pairs(changed))
+        self.version = version
+
+    def load_changes(self, version):
+        """Рецепты, изменённые после self.version, или None."""
+        if self.index is None or not 0 < version - self.version <= MAX_CHANGES:
+            return None
+        keys = [
+            _changes_key(number)
+            for number in range(self.version + 1, version + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return None
+        return sorted({pk for ids in changes.values() for pk in ids})
+
+
+ingredient_index = IndexHolder()
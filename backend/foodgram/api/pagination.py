@@ -1,6 +1,77 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class OrderedCursorPagination(CursorPagination):
+    """Курсорная пагинация с порядком из атрибута ordering.
+
+    Стандартная берёт порядок у OrderingFilter представления, а тот без
+    параметра ordering в запросе возвращает None.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
 
 
 class CustomPageNumberPagination(PageNumberPagination):
+    """Постраничная пагинация с переключением на курсорную.
+
+    По умолчанию работает как обычная пагинация по номеру страницы.
+    С параметром pagination=cursor (и далее по ссылкам next/previous
+    с параметром cursor) выдача идёт по курсору без COUNT(*) и OFFSET:
+    порядок задаётся атрибутом cursor_ordering представления и должен
+    поддерживаться индексом. cursor_ordering = None отключает курсорный
+    режим, например для выдачи, упорядоченной не по полям модели.
+    """
     page_size = 6
     page_size_query_param = 'limit'
+    mode_query_param = 'pagination'
+    cursor_ordering = ('-id', )
+
+    def get_cursor_paginator(self, request, view):
+        if (request.query_params.get(self.mode_query_param) != 'cursor'
+                and CursorPagination.cursor_query_param
+                not in request.query_params):
+            return None
+        ordering = getattr(view, 'cursor_ordering', self.cursor_ordering)
+        if ordering is None:
+            return None
+        paginator = OrderedCursorPagination()
+        paginator.page_size = self.page_size
+        paginator.page_size_query_param = self.page_size_query_param
+        paginator.ordering = ordering
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = self.get_cursor_paginator(request, view)
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Постраничный режим paginate_queryset через асинхронный ORM."""
+        self.cursor_paginator = None
+        paginator = self.django_paginator_class(
+            queryset, self.get_page_size(request)
+        )
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        self.page.object_list = [
+            obj async for obj in self.page.object_list
+        ]
+        self.request = request
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,137 @@
+"""Кэш множеств id, с которыми связан пользователь.
+
+Признаки is_favorited, is_in_shopping_cart и is_subscribed отвечают на
+вопрос, входит ли рецепт (автор) в избранное, список покупок или
+подписки пользователя. Вместо запроса на каждый объект множество id
+целиком читается один раз и хранится в кэше Django отсортированным
+массивом 4-байтовых чисел (40 тысяч избранных рецептов — 160 КБ), а
+проверка вхождения — двоичный поиск. В пределах запроса прочитанные
+множества запоминаются на объекте запроса.
+
+Ключ содержит версию пары пользователь/связь (api.cache). Запись связей
+после фиксации транзакции сдвигает версию и, если никто не успел
+сдвинуть её раньше, кладёт под новой версией изменённую копию
+множества; иначе следующее чтение загрузит его из базы. Другие процессы
+видят версии и множества только через общий кэш, поэтому без него
+множества читаются из базы на каждый запрос и в кэш не попадают.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from recipe.models import FavoriteRecipe, ShoppingList
+from user.models import Follow
+
+from .cache import bump_version, get_version, is_cache_shared
+
+RELATIONS = {
+    FavoriteRecipe: ('favorites', 'recipe_id'),
+    ShoppingList: ('cart', 'recipe_id'),
+    Follow: ('following', 'author_id'),
+}
+TYPECODE = 'I'
+
+
+class IdSet:
+    """Отсортированный массив id с проверкой вхождения за O(log n)."""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __contains__(self, pk):
+        index = bisect_left(self.ids, pk)
+        return index < len(self.ids) and self.ids[index] == pk
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _version_name(user_id, model):
+    return f'relations:{user_id}:{RELATIONS[model][0]}'
+
+
+def relation_versions(user_id):
+    """Имена версий всех связей пользователя: ключ для ETag ответов."""
+    return [_version_name(user_id, model) for model in RELATIONS]
+
+
+def _key(user_id, model, version):
+    return f'{_version_name(user_id, model)}:{version}'
+
+
+def _unpack(data):
+    ids = array(TYPECODE)
+    ids.frombytes(data)
+    return ids
+
+
+def _query_ids(user_id, model):
+    field = RELATIONS[model][1]
+    return array(TYPECODE, model.objects.filter(
+        user_id=user_id
+    ).order_by(field).values_list(field, flat=True).iterator())
+
+
+def load_ids(user_id, model):
+    """Отсортированный массив id связи model пользователя user_id."""
+    if not is_cache_shared():
+        return _query_ids(user_id, model)
+    version = get_version(_version_name(user_id, model))
+    key = _key(user_id, model, version)
+    data = cache.get(key)
+    if data is not None:
+        return _unpack(data)
+    ids = _query_ids(user_id, model)
+    cache.set(key, ids.tobytes(), settings.RELATION_CACHE_TIMEOUT)
+    return ids
+
+
+def get_relation(request, model):
+    """IdSet связи model текущего пользователя, один раз на запрос."""
+    request = getattr(request, '_request', request)
+    if not hasattr(request, '_relations'):
+        request._relations = {}
+    loaded = request._relations
+    if model not in loaded:
+        loaded[model] = IdSet(load_ids(request.user.pk, model))
+    return loaded[model]
+
+
+def load_relations(request):
+    """Заранее читает все множества: для асинхронных представлений."""
+    for model in RELATIONS:
+        get_relation(request, model)
+
+
+def _apply(ids, added, removed):
+    for pk in added:
+        index = bisect_left(ids, pk)
+        if index == len(ids) or ids[index] != pk:
+            ids.insert(index, pk)
+    for pk in removed:
+        index = bisect_left(ids, pk)
+        if index < len(ids) and ids[index] == pk:
+            del ids[index]
+    return ids
+
+
+def update_relation(model, user_id, added=(), removed=()):
+    """Отражает в кэше созданные и удалённые связи после фиксации."""
+    added, removed = list(added), list(removed)
+
+    def update():
+        name = _version_name(user_id, model)
+        version = get_version(name)
+        data = cache.get(_key(user_id, model, version))
+        if bump_version(name) != version + 1 or data is None:
+            return
+        cache.set(
+            _key(user_id, model, version + 1),
+            _apply(_unpack(data), added, removed).tobytes(),
+            settings.RELATION_CACHE_TIMEOUT,
+        )
+
+    if added or removed:
+        transaction.on_commit(update)
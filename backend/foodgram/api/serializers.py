@@ -1,19 +1,40 @@
 from django.contrib.auth import get_user_model
+from django.core.files import File
 from django.core.validators import MinValueValidator
 from django.db import transaction
 from django.db.models import F
-from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
+from recipe.images import rendition_urls, save_original
 from recipe.models import (AmountIngredient, FavoriteRecipe, Ingredient,
                            Recipe, ShoppingList, Tag)
 from rest_framework import serializers
 from user.models import Follow
 
+from .fields import Base64ImageField
+from .relations import get_relation
+from .tags import get_tag_registry
+
 User = get_user_model()
 
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
+class RenditionsMixin(serializers.Serializer):
+    """Добавляет ссылки на уменьшенные варианты изображения рецепта."""
+    images = serializers.SerializerMethodField()
+
+    def get_images(self, obj):
+        urls = rendition_urls(
+            obj.image.name, obj.renditions_image == obj.image.name
+        )
+        request = self.context.get('request')
+        if request is None:
+            return urls
+        return {
+            rendition: request.build_absolute_uri(url)
+            for rendition, url in urls.items()
+        }
+
+
+class ShortRecipeSerializer(RenditionsMixin, serializers.ModelSerializer):
     """Сериализатор, укороченный список полей из модели Recipe."""
     class Meta:
         model = Recipe
@@ -21,6 +42,7 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'images',
             'cooking_time'
         )
 
@@ -41,9 +63,11 @@ class UserSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
-        if self.context.get('request').user.is_anonymous:
+        if request.user.is_anonymous:
             return False
-        return Follow.objects.filter(user=request.user).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.pk in get_relation(request, Follow)
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -80,6 +104,10 @@ class FollowSerializer(UserSerializer):
         return ShortRecipeSerializer
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'preview_recipes'):
+            return ShortRecipeSerializer(
+                obj.preview_recipes, many=True, read_only=True
+            ).data
         request = self.context.get('request')
         limit = request.GET.get('recipes_limit')
         recipes = obj.recipe.all()
@@ -89,15 +117,24 @@ class FollowSerializer(UserSerializer):
         return serializer.data
 
     def get_recipes_count(self, obj):
-        return obj.recipe.count()
+        stats = getattr(obj, 'stats', None)
+        if stats is None:
+            return obj.recipe.count()
+        return stats.recipes_count
 
 
 class TagSerializer(serializers.ModelSerializer):
-    """Сериализатор для тегов."""
+    """Сериализатор для тегов, представление берётся из реестра."""
     class Meta:
         model = Tag
         fields = '__all__'
 
+    def to_representation(self, tag):
+        data = get_tag_registry(self.context.get('request')).get(tag.pk)
+        if data is None:
+            return super().to_representation(tag)
+        return data
+
 
 class IngredientSerializer(serializers.ModelSerializer):
     """Сериализатор для ингредиентов."""
@@ -106,7 +143,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(RenditionsMixin, serializers.ModelSerializer):
     """Сериализатор для рецептов."""
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
@@ -126,6 +163,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time'
         )
@@ -135,26 +173,53 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_ingredients(self, obj):
-        ingredients = obj.ingredients.values(
-            'id', 'name', 'measurement_unit', amount=F('recipe_am__amount')
-        )
-        return ingredients
+        return [
+            {
+                'id': amount.ingredients.id,
+                'name': amount.ingredients.name,
+                'measurement_unit': amount.ingredients.measurement_unit,
+                'amount': amount.amount,
+            }
+            for amount in obj.recipe.all()
+        ]
 
     def get_is_favorited(self, obj):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
-        return FavoriteRecipe.objects.filter(
-            user=request.user, recipe=obj
-        ).exists()
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return obj.pk in get_relation(request, FavoriteRecipe)
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
-        return ShoppingList.objects.filter(
-            user=request.user, recipe=obj
-        ).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return obj.pk in get_relation(request, ShoppingList)
+
+
+class CookRecipeSerializer(RecipeSerializer):
+    """Рецепт с долей имеющихся ингредиентов и числом недостающих."""
+    coverage = serializers.FloatField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('coverage', 'missing')
+
+
+class IngredientIdsSerializer(serializers.Serializer):
+    """Параметры подбора рецептов по имеющимся ингредиентам."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=2 ** 31 - 1),
+        allow_empty=False,
+        max_length=200,
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+
+    def validate_ingredients(self, value):
+        return list(dict.fromkeys(value))
 
 
 class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
@@ -181,76 +246,141 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
             'id', 'name', 'measurement_unit', amount=F('recipe_am__amount'))
         return ingredients
 
+    def validate_ingredients(self, value):
+        amounts = {}
+        for ingredient in value:
+            if 'id' not in ingredient or 'amount' not in ingredient:
+                raise serializers.ValidationError(
+                    'Укажите id и amount для каждого ингредиента.'
+                )
+            if ingredient['amount'] < 1:
+                raise serializers.ValidationError(
+                    'Количество ингредиента не может быть меньше 1'
+                )
+            if ingredient['id'] in amounts:
+                raise serializers.ValidationError(
+                    f'Ингредиент {ingredient["id"]} указан дважды.'
+                )
+            amounts[ingredient['id']] = ingredient['amount']
+        existing = Ingredient.objects.in_bulk(amounts)
+        missing = sorted(set(amounts) - set(existing))
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {missing}'
+            )
+        return amounts
+
+    def store_image(self, validated_data):
+        """Записывает проверенное изображение в хранилище."""
+        image = validated_data.get('image')
+        if isinstance(image, File):
+            with image:
+                validated_data['image'] = save_original(image)
+
     @transaction.atomic
     def create(self, validated_data):
+        self.store_image(validated_data)
         author = self.context.get('request').user
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(author=author, **validated_data)
         recipe.tags.set(tags)
-        all_ingredients = []
-        for ingredient in ingredients:
-            all_ingredients.append(AmountIngredient(
-                recipe=recipe,
-                ingredients=get_object_or_404(Ingredient, pk=ingredient['id']),
-                amount=ingredient['amount']
-            ))
-        AmountIngredient.objects.bulk_create(all_ingredients)
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(
+                recipe=recipe, ingredients_id=pk, amount=amount
+            )
+            for pk, amount in ingredients.items()
+        )
         return recipe
 
+    def update_ingredients(self, recipe, ingredients):
+        """Применяет к рецепту только изменившиеся количества."""
+        current = {
+            amount.ingredients_id: amount
+            for amount in AmountIngredient.objects.filter(recipe=recipe)
+        }
+        changed = []
+        for pk, amount in ingredients.items():
+            if pk in current and current[pk].amount != amount:
+                current[pk].amount = amount
+                changed.append(current[pk])
+        removed = [
+            amount.pk for pk, amount in current.items()
+            if pk not in ingredients
+        ]
+        if removed:
+            AmountIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            AmountIngredient.objects.bulk_update(changed, ('amount', ))
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(
+                recipe=recipe, ingredients_id=pk, amount=amount
+            )
+            for pk, amount in ingredients.items()
+            if pk not in current
+        )
+
     @transaction.atomic
     def update(self, recipe, validated_data):
+        self.store_image(validated_data)
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
         if ingredients is not None:
-            recipe.ingredients.clear()
-            all_ingredients = [
-                AmountIngredient(
-                    recipe=recipe,
-                    ingredients=get_object_or_404(
-                        Ingredient, pk=ingredient['id']
-                    ),
-                    amount=ingredient['amount']
-                )
-                for ingredient in ingredients
-            ]
-            AmountIngredient.objects.bulk_create(all_ingredients)
+            self.update_ingredients(recipe, ingredients)
         if tags:
-            recipe.tags.clear()
             recipe.tags.set(tags)
         return super().update(recipe, validated_data)
 
     def to_representation(self, recipe):
+        request = self.context.get('request')
+        recipe = Recipe.objects.with_related().get(pk=recipe.pk)
         data = RecipeSerializer(
             recipe,
-            context={'request': self.context.get('request')}
+            context={'request': request}
         ).data
         return data
 
 
-class FavoriteSerializator(serializers.ModelSerializer):
-    """Сериализатор для избранных рецептов. """
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для массового добавления/удаления."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
+class ImportAmountSerializer(serializers.ModelSerializer):
+    """Ингредиент строки импорта по естественному ключу."""
+    name = serializers.CharField(max_length=200)
+    measurement_unit = serializers.CharField(max_length=200)
 
     class Meta:
-        model = FavoriteRecipe
-        fields = ('user', 'recipe', )
+        model = AmountIngredient
+        fields = ('name', 'measurement_unit', 'amount')
+        extra_kwargs = {'amount': {'required': True}}
 
-    def to_representation(self, instance):
-        return ShortRecipeSerializer(
-            instance.recipe,
-            context={'request': self.context.get('request')}
-        ).data
 
+class ImportRecipeSerializer(serializers.ModelSerializer):
+    """Строка импорта рецептов: типы и ограничения полей модели.
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Сериализатор для списка покупок. """
+    Существование автора, тегов, ингредиентов и уникальность названия
+    проверяет импорт одним запросом на пачку.
+    """
+    author = serializers.CharField(required=False)
+    image = serializers.CharField()
+    tags = serializers.ListField(
+        child=serializers.CharField(), required=False
+    )
+    ingredients = ImportAmountSerializer(many=True, allow_empty=False)
 
     class Meta:
-        model = ShoppingList
-        fields = ('user', 'recipe', )
-
-    def to_representation(self, instance):
-        return ShortRecipeSerializer(
-            instance.recipe,
-            context={'request': self.context.get('request')}
-        ).data
+        model = Recipe
+        fields = (
+            'name', 'text', 'cooking_time', 'author', 'image', 'tags',
+            'ingredients',
+        )
+        extra_kwargs = {'name': {'validators': []}}
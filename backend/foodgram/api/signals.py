@@ -0,0 +1,207 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from recipe.images import schedule_renditions
+from recipe.models import (AmountIngredient, FavoriteRecipe, Ingredient,
+                           Recipe, ShoppingList, Tag)
+from recipe.search import update_search_index
+from rest_framework.authtoken.models import Token
+from user.models import Follow, UserStats
+
+from .authentication import token_cache
+from .cache import INGREDIENTS, RECIPES, TAGS, bump_version
+from .catalog import schedule_rebuild
+from .matching import record_changes
+from .relations import update_relation
+from .tags import reload_tag_registry
+from .utils import update_counter
+
+User = get_user_model()
+
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name', 'email')
+
+
+def invalidate(*names):
+    """Сдвигает версии names после фиксации транзакции.
+
+    Раньше сдвигать нельзя: запрос, прочитавший из базы старые данные,
+    закрепил бы их за новой версией в кэше и в ETag.
+    """
+    transaction.on_commit(lambda: [bump_version(name) for name in names])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=AmountIngredient)
+@receiver(post_delete, sender=AmountIngredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_recipes(sender, **kwargs):
+    invalidate(RECIPES)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    invalidate(TAGS)
+    transaction.on_commit(reload_tag_registry)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    invalidate(INGREDIENTS)
+    schedule_rebuild()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate(RECIPES)
+
+
+@receiver(pre_save, sender=User)
+def check_recipe_author(sender, instance, update_fields=None, **kwargs):
+    """Запоминает, меняются ли поля автора, которые видны в рецептах.
+
+    Новые пользователи и пользователи без рецептов в выдаче рецептов не
+    встречаются; удаление автора удаляет и его рецепты, а их сигналы
+    сдвигают версию сами.
+    """
+    instance._recipe_author_changed = False
+    if instance.pk is None or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_FIELDS)
+    ):
+        return
+    old = User.objects.filter(
+        pk=instance.pk, recipe__isnull=False
+    ).values(*AUTHOR_FIELDS).first()
+    instance._recipe_author_changed = old is not None and any(
+        old[field] != getattr(instance, field) for field in AUTHOR_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_recipe_authors(sender, instance, **kwargs):
+    if getattr(instance, '_recipe_author_changed', False):
+        invalidate(RECIPES)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    token_cache.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.user_id, instance.key)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Recipe)
+def build_image_renditions(sender, instance, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: schedule_renditions(name))
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.filter(user_id=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    UserStats.objects.filter(user_id=instance.author_id).update(
+        recipes_count=Greatest(F('recipes_count') - 1, 0)
+    )
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_save, sender=Follow)
+def count_created_relation(sender, instance, created, **kwargs):
+    if created:
+        update_counter(sender, [relation_target_id(instance)], 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_delete, sender=Follow)
+def count_deleted_relation(sender, instance, **kwargs):
+    update_counter(sender, [relation_target_id(instance)], -1)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_save, sender=Follow)
+def cache_created_relation(sender, instance, created, **kwargs):
+    if created:
+        update_relation(
+            sender, instance.user_id, added=[relation_target_id(instance)]
+        )
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_delete, sender=Follow)
+def cache_deleted_relation(sender, instance, **kwargs):
+    update_relation(
+        sender, instance.user_id, removed=[relation_target_id(instance)]
+    )
+
+
+def relation_target_id(instance):
+    if isinstance(instance, Follow):
+        return instance.author_id
+    return instance.recipe_id
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def index_recipe(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: update_search_index([pk]))
+
+
+@receiver(post_save, sender=AmountIngredient)
+@receiver(post_delete, sender=AmountIngredient)
+def index_recipe_ingredients(sender, instance, **kwargs):
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: update_search_index([recipe_id]))
+
+
+@receiver(post_save, sender=Ingredient)
+def index_ingredient_recipes(sender, instance, created, **kwargs):
+    if created:
+        return
+    ids = list(AmountIngredient.objects.filter(
+        ingredients=instance
+    ).values_list('recipe_id', flat=True))
+    transaction.on_commit(lambda: update_search_index(ids))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=AmountIngredient)
+@receiver(post_delete, sender=AmountIngredient)
+def track_recipe_ingredients(sender, instance, **kwargs):
+    recipe_id = getattr(instance, 'recipe_id', instance.pk)
+    transaction.on_commit(lambda: record_changes([recipe_id]))
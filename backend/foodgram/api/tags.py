@@ -0,0 +1,113 @@
+"""Реестр тегов в памяти процесса.
+
+Тегов мало, и меняются они редко, поэтому таблица целиком хранится
+неизменяемым снимком: slug -> id для фильтра ленты и id -> готовое
+представление для TagSerializer и списка тегов. Снимок создаётся при
+первом обращении и заменяется целиком (одним присваиванием) после
+фиксации изменения тега. Снимок помнит версию TAGS (api.cache), по
+которой другие процессы узнают об изменении; в пределах запроса версия
+проверяется один раз. Версия видна другим процессам только через общий
+кэш, поэтому без него снимок читается из базы на каждый запрос.
+"""
+import threading
+from types import MappingProxyType
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from recipe.models import Tag
+from rest_framework.response import Response
+
+from .cache import TAGS, get_version, is_cache_shared
+
+_lock = threading.Lock()
+_registry = None
+
+
+class TagRegistry:
+    """Неизменяемый снимок таблицы тегов."""
+
+    def __init__(self, version, tags):
+        self.version = version
+        self.tags = tuple(tags)
+        self.by_id = MappingProxyType({tag['id']: tag for tag in self.tags})
+        self.by_slug = MappingProxyType(
+            {tag['slug']: tag['id'] for tag in self.tags}
+        )
+        self.choices = tuple((tag['slug'], tag['name']) for tag in self.tags)
+
+    def get(self, pk):
+        """Представление тега pk (копия) или None."""
+        tag = self.by_id.get(pk)
+        return None if tag is None else dict(tag)
+
+    def as_list(self):
+        return [dict(tag) for tag in self.tags]
+
+
+def _memoized(request):
+    request = getattr(request, '_request', request)
+    return getattr(request, '_tag_registry', None)
+
+
+def _remember(request, registry):
+    if request is not None:
+        getattr(request, '_request', request)._tag_registry = registry
+    return registry
+
+
+def _current(request):
+    registry = _memoized(request)
+    if registry is not None:
+        return registry
+    if not is_cache_shared():
+        return None
+    if _registry is not None and _registry.version == get_version(TAGS):
+        return _remember(request, _registry)
+    return None
+
+
+def reload_tag_registry():
+    """Загружает теги из базы и подменяет снимок.
+
+    Без общего кэша снимок не сохраняется: изменения тегов в других
+    процессах были бы не видны.
+    """
+    global _registry
+    if not is_cache_shared():
+        return TagRegistry(None, Tag.objects.order_by('pk').values())
+    with _lock:
+        version = get_version(TAGS)
+        if _registry is None or _registry.version != version:
+            _registry = TagRegistry(
+                version, Tag.objects.order_by('pk').values()
+            )
+        return _registry
+
+
+def get_tag_registry(request=None):
+    """Актуальный снимок; с request — один и тот же на весь запрос."""
+    return _current(request) or _remember(request, reload_tag_registry())
+
+
+async def aget_tag_registry(request=None):
+    """get_tag_registry для асинхронных представлений."""
+    registry = _current(request)
+    if registry is None:
+        registry = _remember(
+            request, await sync_to_async(reload_tag_registry)()
+        )
+    return registry
+
+
+class TagRegistryMixin:
+    """list и retrieve тегов из реестра, без запросов к базе."""
+
+    def list(self, request, *args, **kwargs):
+        return Response(get_tag_registry(request).as_list())
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        tag = get_tag_registry(request).get(int(pk)) if pk.isdigit() else None
+        if tag is None:
+            raise Http404
+        return Response(tag)
@@ -0,0 +1,148 @@
+import json
+import shutil
+import tempfile
+from contextlib import nullcontext
+from io import StringIO
+from unittest import mock
+
+from api import urls as api_urls
+from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import include, path
+from recipe.management.commands.seed_data import PREFIX
+from recipe.models import FavoriteRecipe, Recipe, ShoppingList
+from rest_framework.authtoken.models import Token
+from user.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+# Асинхронные представления под /api/, синхронные — под /sync/.
+urlpatterns = [
+    path('api/', include(
+        (api_urls.async_urlpatterns + api_urls.urlpatterns, 'api')
+    )),
+    path('sync/', include((api_urls.urlpatterns, 'api'), namespace='sync')),
+]
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, ROOT_URLCONF=__name__)
+class AsyncViewsTestCase(TestCase):
+    """Асинхронные представления отвечают так же, как синхронные."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_data', users=5, recipes=20, ingredients=30,
+            favorites=5, cart=3, follows=2, stdout=StringIO(),
+        )
+        cls.user = User.objects.get(username=f'{PREFIX}0')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.headers = {'Authorization': f'Token {cls.token.key}'}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def forbid(self, viewset, action):
+        """Синхронное действие, которое асинхронный путь не должен вызывать."""
+        return mock.patch.object(
+            viewset, action, side_effect=AssertionError(action)
+        )
+
+    async def get_both(self, path, params=None, headers=None, sync=None):
+        """Ответы асинхронного и синхронного представлений на запрос.
+
+        sync — (набор, действие), которые обслуживают запрос синхронно:
+        на асинхронном пути они не вызываются.
+        """
+        headers = headers or {}
+        with self.forbid(*sync) if sync else nullcontext():
+            response = await self.async_client.get(
+                f'/api/{path}', params or {}, headers=headers
+            )
+        expected = await self.async_client.get(
+            f'/sync/{path}', params or {}, headers=headers
+        )
+        return response, expected
+
+    def assert_same_json(self, response, expected):
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(
+            response.json(),
+            json.loads(expected.content.replace(b'/sync/', b'/api/')),
+        )
+
+    async def assert_same(self, path, params=None, headers=None, sync=None):
+        response, expected = await self.get_both(path, params, headers, sync)
+        self.assertEqual(response.status_code, 200)
+        self.assert_same_json(response, expected)
+        return response.json()
+
+    async def test_recipe_list_anonymous(self):
+        data = await self.assert_same(
+            'recipes/', {'limit': 5}, sync=(RecipeViewSet, 'list')
+        )
+        self.assertEqual(len(data['results']), 5)
+
+    async def test_recipe_list_authenticated(self):
+        data = await self.assert_same(
+            'recipes/', {'is_favorited': 1}, self.headers,
+            (RecipeViewSet, 'list'),
+        )
+        favorites = await FavoriteRecipe.objects.filter(
+            user=self.user
+        ).acount()
+        self.assertEqual(data['count'], favorites)
+        self.assertTrue(all(
+            recipe['is_favorited'] for recipe in data['results']
+        ))
+
+    async def test_recipe_detail(self):
+        recipe = await Recipe.objects.order_by('pk').afirst()
+        data = await self.assert_same(
+            f'recipes/{recipe.pk}/', None, self.headers,
+            (RecipeViewSet, 'retrieve'),
+        )
+        self.assertEqual(data['id'], recipe.pk)
+
+    async def test_tags_and_ingredients(self):
+        await self.assert_same('tags/', sync=(TagViewSet, 'list'))
+        await self.assert_same(
+            'ingredients/', {'name': 'ингр'},
+            sync=(IngredientViewSet, 'list'),
+        )
+
+    async def test_shopping_cart(self):
+        with self.forbid(RecipeViewSet, 'download_shopping_cart'):
+            response = await self.async_client.get(
+                '/api/recipes/download_shopping_cart/', headers=self.headers
+            )
+        self.assertEqual(response.status_code, 200)
+        content = b''.join([part async for part in response])
+        self.assertTrue(content.decode().startswith('Список покупок'))
+        self.assertTrue(
+            await ShoppingList.objects.filter(user=self.user).aexists()
+        )
+
+    async def test_invalid_token_falls_back(self):
+        response, expected = await self.get_both(
+            'recipes/', headers={'Authorization': 'Token invalid'}
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assert_same_json(response, expected)
+
+    async def test_other_methods_fall_back(self):
+        response = await self.async_client.post(
+            '/api/recipes/', {}, headers=self.headers
+        )
+        expected = await self.async_client.post(
+            '/sync/recipes/', {}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assert_same_json(response, expected)
@@ -0,0 +1,60 @@
+import shutil
+import tempfile
+
+from api.authentication import token_cache
+from api.checks import check_shared_cache
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from user.models import User
+
+CACHE_DIR = tempfile.mkdtemp()
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': CACHE_DIR,
+}}
+
+
+class TokenCacheTestCase(TestCase):
+    """Кэш токенов включается только с общим кэшем."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pw'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def request(self):
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_local_cache_disabled(self):
+        self.request()
+        self.request()
+        self.assertEqual(token_cache.get_stats()['miss'], 2)
+        self.assertEqual(token_cache.get_stats()['size'], 0)
+        self.assertEqual(
+            [warning.id for warning in check_shared_cache(None)],
+            ['api.W001'],
+        )
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_shared_cache_enabled(self):
+        cache.clear()
+        self.request()
+        self.request()
+        self.assertEqual(token_cache.get_stats()['local'], 1)
+        self.assertEqual(check_shared_cache(None), [])
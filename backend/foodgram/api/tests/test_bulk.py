@@ -0,0 +1,194 @@
+import base64
+import json
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from api import bulk
+from api.bulk import RecipeImporter
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DataError
+from django.test import TestCase, override_settings
+from PIL import Image
+from recipe.images import save_original
+from recipe.models import Ingredient, Recipe, Tag
+from user.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_bytes(color='#E0A060'):
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def data_uri(color='#E0A060'):
+    return 'data:image/png;base64,' + base64.b64encode(
+        image_bytes(color)
+    ).decode()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeImporterTestCase(TestCase):
+    """Импорт рецептов: ошибки отдельных строк не прерывают импорт."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='author', email='author@example.com', password='pw'
+        )
+        Tag(name='Десерт', slug='desert', color='#E26C2D').save()
+        Ingredient.objects.create(name='сахар', measurement_unit='г')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        self.image = save_original(ContentFile(image_bytes(), name='image'))
+
+    def record(self, name='Пирог', **fields):
+        return {
+            'name': name,
+            'text': 'Испечь.',
+            'cooking_time': 30,
+            'image': self.image,
+            'tags': ['desert'],
+            'ingredients': [
+                {'name': 'сахар', 'measurement_unit': 'г', 'amount': 100}
+            ],
+            **fields,
+        }
+
+    def run_import(self, *records):
+        lines = [
+            json.dumps(record, ensure_ascii=False) for record in records
+        ]
+        return RecipeImporter(self.user, chunk_size=10).run(lines)
+
+    def assert_errors(self, report, lines):
+        self.assertEqual(
+            [error['line'] for error in report['errors']], lines,
+            report['errors'],
+        )
+
+    def test_import(self):
+        data_uri = 'data:image/png;base64,' + base64.encodebytes(
+            image_bytes()
+        ).decode()
+        report = self.run_import(
+            self.record(), self.record('Торт', image=data_uri)
+        )
+        self.assertEqual(report, {'created': 2, 'errors': []})
+        recipe = Recipe.objects.get(name='Пирог')
+        self.assertEqual(recipe.author, self.user)
+        self.assertEqual(
+            list(recipe.tags.values_list('slug', flat=True)), ['desert']
+        )
+        self.assertEqual(recipe.recipe.get().amount, 100)
+
+    def test_malformed_records(self):
+        report = self.run_import(
+            self.record(['Пирог']),
+            self.record('Число', ingredients=[5]),
+            self.record('Не список', ingredients=5),
+            self.record('Строка тегов', tags='desert'),
+            self.record('Без количества', ingredients=[
+                {'name': 'сахар', 'measurement_unit': 'г'}
+            ]),
+            self.record('Долго', cooking_time='долго'),
+            self.record('Длинное' * 50),
+            self.record(),
+        )
+        self.assertEqual(report['created'], 1)
+        self.assert_errors(report, [1, 2, 3, 4, 5, 6, 7])
+        self.assertIn('name', report['errors'][0]['error'])
+        self.assertIn('tags', report['errors'][3]['error'])
+        self.assertIn('ingredients.0.amount', report['errors'][4]['error'])
+
+    def test_image_paths(self):
+        report = self.run_import(
+            self.record('Нет файла', image='recipe/image/missing.png'),
+            self.record('Выше', image='recipe/image/../../settings.py'),
+            self.record('Абсолютный', image='/etc/passwd'),
+            self.record('Другой каталог', image='static/logo.png'),
+            self.record(),
+        )
+        self.assertEqual(report['created'], 1)
+        self.assert_errors(report, [1, 2, 3, 4])
+
+    def test_database_error_reported_per_line(self):
+        save = RecipeImporter.save
+
+        def fail_on_long_name(importer, rows):
+            if any(row.recipe.name.startswith('Ошибка') for row in rows):
+                raise DataError('value too long')
+            return save(importer, rows)
+
+        with mock.patch.object(RecipeImporter, 'save', fail_on_long_name):
+            report = self.run_import(
+                self.record('Первый'), self.record('Ошибка'),
+                self.record('Третий'),
+            )
+        self.assertEqual(report['created'], 2)
+        self.assert_errors(report, [2])
+        self.assertEqual(
+            set(Recipe.objects.values_list('name', flat=True)),
+            {'Первый', 'Третий'},
+        )
+
+    def test_invalid_image_reported_per_line(self):
+        report = self.run_import(
+            self.record('Первый', image='data:image/png;base64,!!!'),
+            self.record('Второй', image=data_uri()),
+        )
+        self.assertEqual(report['created'], 1)
+        self.assert_errors(report, [1])
+        self.assertIn('изображение', report['errors'][0]['error'])
+
+    def test_images_stored_one_at_a_time(self):
+        open_files = []
+        decode = bulk.decode_base64_image
+
+        def track(value):
+            self.assertTrue(all(file.closed for file in open_files))
+            open_files.append(decode(value))
+            return open_files[-1]
+
+        with mock.patch.object(bulk, 'decode_base64_image', track):
+            report = self.run_import(
+                self.record('Первый', image=data_uri('#000000')),
+                self.record('Второй', image=data_uri('#FFFFFF')),
+            )
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(len(open_files), 2)
+
+    def test_rejected_row_image_removed(self):
+        save = RecipeImporter.save
+
+        def fail_on_name(importer, rows):
+            if any(row.recipe.name.startswith('Ошибка') for row in rows):
+                raise DataError('value too long')
+            return save(importer, rows)
+
+        with mock.patch.object(RecipeImporter, 'save', fail_on_name):
+            report = self.run_import(
+                self.record('Ошибка', image=data_uri('#000000')),
+                self.record('Общее', image=data_uri('#FFFFFF')),
+                self.record('Ошибка 2', image=data_uri('#FFFFFF')),
+            )
+        self.assertEqual(report['created'], 1)
+        self.assert_errors(report, [1, 3])
+        shared = Recipe.objects.get(name='Общее').image.name
+        self.assertEqual(
+            {
+                f'recipe/image/{name}'
+                for name in default_storage.listdir('recipe/image')[1]
+            },
+            {self.image, shared},
+        )
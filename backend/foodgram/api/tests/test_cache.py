@@ -0,0 +1,53 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recipe.models import Recipe
+from rest_framework.test import APIClient
+from user.models import User
+
+CACHE_DIR = tempfile.mkdtemp()
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': CACHE_DIR,
+}}
+
+
+class AnonymousListCacheTestCase(TestCase):
+    """Анонимная лента кэшируется только в общем кэше."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pw'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def add_recipe_elsewhere(self):
+        # Как импорт из другого процесса: без сигналов этого процесса.
+        Recipe.objects.bulk_create([Recipe(
+            author=self.author, name='Блины', text='Жарить.',
+            cooking_time=30, image='recipe/image/pancakes.png',
+        )])
+
+    def test_local_cache_not_used(self):
+        self.client.get('/api/recipes/')
+        self.add_recipe_elsewhere()
+        response = self.client.get('/api/recipes/')
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(response.json()['count'], 1)
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_shared_cache_hit(self):
+        cache.clear()
+        self.assertEqual(self.client.get('/api/recipes/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/recipes/')['X-Cache'], 'HIT')
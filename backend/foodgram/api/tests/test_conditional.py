@@ -0,0 +1,38 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+CACHE_DIR = tempfile.mkdtemp()
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': CACHE_DIR,
+}}
+
+
+class ConditionalGetTestCase(TestCase):
+    """ETag выдаётся только при общем кэше."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_local_cache_without_validators(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_shared_cache_not_modified(self):
+        cache.clear()
+        etag = self.client.get('/api/recipes/')['ETag']
+        response = self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
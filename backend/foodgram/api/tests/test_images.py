@@ -0,0 +1,123 @@
+import base64
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from api import fields
+from django.test import TestCase, override_settings
+from PIL import Image
+from recipe import images
+from recipe.models import Ingredient, Recipe, Tag
+from rest_framework.test import APIClient
+from user.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def encode_image(size=(8, 8)):
+    buffer = BytesIO()
+    Image.new('RGB', size, '#E0A060').save(buffer, 'PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeImageTestCase(TestCase):
+    """Изображение рецепта в base64."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='author', email='author@example.com', password='pw'
+        )
+        cls.tag = Tag(name='Завтрак', slug='breakfast', color='#E26C2D')
+        cls.tag.save()
+        cls.ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, image, **fields):
+        data = {
+            'name': 'Омлет',
+            'text': 'Взбить и пожарить.',
+            'cooking_time': 10,
+            'tags': [self.tag.pk],
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 5}],
+            'image': f'data:image/png;base64,{image}',
+            **fields,
+        }
+        return self.client.post('/api/recipes/', data, format='json')
+
+    def stored_files(self):
+        return [
+            name for _, _, names in os.walk(MEDIA_ROOT) for name in names
+        ]
+
+    def test_invalid_recipe_leaves_no_file(self):
+        response = self.create(encode_image(), cooking_time=0)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_line_wrapped_base64(self):
+        data = encode_image()
+        wrapped = '\n'.join(
+            data[start:start + 76] for start in range(0, len(data), 76)
+        )
+        response = self.create(wrapped)
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        self.assertEqual(self.stored_files(), [
+            os.path.basename(recipe.image.name)
+        ])
+
+    def test_decompression_bomb(self):
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 8):
+            response = self.create(encode_image((64, 64)))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.json())
+        self.assertEqual(self.stored_files(), [])
+
+    def test_renditions_fall_back_to_original(self):
+        response = self.create(encode_image())
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        original = f'http://testserver/media/{recipe.image.name}'
+        self.assertEqual(
+            set(response.json()['images'].values()), {original}
+        )
+        images.build_renditions(recipe.image.name)
+        response = self.client.get(f'/api/recipes/{recipe.pk}/')
+        self.assertNotIn(original, response.json()['images'].values())
+
+    def test_decode_across_chunks(self):
+        data = encode_image((32, 32))
+        wrapped = 'data:image/png;base64,' + '\n'.join(
+            data[start:start + 5] for start in range(0, len(data), 5)
+        )
+        with mock.patch.object(fields, 'DECODE_CHUNK', 7):
+            file = fields.decode_base64_image(wrapped)
+        file.seek(0)
+        self.assertEqual(file.read(), base64.b64decode(data))
+
+    def test_list_does_not_query_storage(self):
+        response = self.create(encode_image())
+        images.build_renditions(Recipe.objects.get().image.name)
+        with mock.patch.object(
+            images.default_storage, 'exists', side_effect=AssertionError
+        ):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(
+            'renditions' in url
+            for url in response.json()['results'][0]['images'].values()
+        ))
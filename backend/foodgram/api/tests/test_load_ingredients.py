@@ -0,0 +1,40 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from recipe.models import Ingredient
+
+DATA_DIR = tempfile.mkdtemp()
+
+
+class LoadIngredientsTestCase(TestCase):
+    """Загрузка ингредиентов пропускает некорректные строки."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+    def load(self, content):
+        path = os.path.join(DATA_DIR, 'ingredients.csv')
+        with open(path, 'w', encoding='UTF-8') as file:
+            file.write(content)
+        output = StringIO()
+        call_command('load_ingredients', path=path, stdout=output)
+        return output.getvalue()
+
+    def test_too_long_fields_reported(self):
+        output = self.load(
+            'соль,г\n'
+            f'{"с" * 201},г\n'
+            f'сахар,{"г" * 201}\n'
+            'перец\n'
+        )
+        self.assertIn('добавлено: 1', output)
+        self.assertIn('некорректных: 3', output)
+        self.assertEqual(
+            list(Ingredient.objects.values_list('name', flat=True)), ['соль']
+        )
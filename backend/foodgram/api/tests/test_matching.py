@@ -0,0 +1,72 @@
+from unittest import mock
+
+import numpy as np
+from api.matching import IndexHolder, IngredientIndex
+from django.core.cache import cache
+from django.test import TestCase
+from recipe.models import AmountIngredient, Ingredient, Recipe
+from rest_framework.test import APIClient
+from user.models import User
+
+
+class IngredientIndexTestCase(TestCase):
+    """Подбор рецептов по индексу без базы."""
+
+    def setUp(self):
+        self.index = IngredientIndex.from_pairs(
+            np.array([1, 2, 3, 4, 5, 1], dtype=np.int64),
+            np.array([7, 7, 7, 7, 7, 8], dtype=np.int64),
+        )
+
+    def test_duplicate_ids_counted_once(self):
+        recipes, coverage, missing = self.index.match([1, 1, 1, 1, 1])
+        self.assertEqual(recipes.tolist(), [8, 7])
+        self.assertEqual(coverage.tolist(), [1.0, 0.2])
+        self.assertEqual(missing.tolist(), [0, 4])
+
+
+class CookTestCase(TestCase):
+    """Эндпоинт /api/recipes/cook/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pw'
+        )
+        recipe = Recipe.objects.create(
+            author=author, name='Салат', text='Нарезать.',
+            cooking_time=5, image='recipe/image/salad.png',
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'овощ {number}',
+                                      measurement_unit='г')
+            for number in range(5)
+        ]
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(recipe=recipe, ingredients=ingredient, amount=10)
+            for ingredient in cls.ingredients
+        )
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('api.views.ingredient_index', IndexHolder())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def cook(self, ingredients):
+        return self.client.get(
+            '/api/recipes/cook/', {'ingredients': ingredients}
+        )
+
+    def test_duplicate_ids(self):
+        pk = self.ingredients[0].pk
+        response = self.cook(','.join([str(pk)] * 5))
+        self.assertEqual(response.status_code, 200)
+        result = response.json()['results'][0]
+        self.assertEqual(result['coverage'], 0.2)
+        self.assertEqual(result['missing'], 4)
+
+    def test_id_out_of_range(self):
+        self.assertEqual(self.cook(str(2 ** 31)).status_code, 400)
+        self.assertEqual(self.cook(str(2 ** 31 - 1)).status_code, 200)
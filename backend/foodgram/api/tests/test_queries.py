@@ -0,0 +1,171 @@
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from api import tags
+from api.authentication import token_cache
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recipe.management.commands.seed_data import PREFIX
+from recipe.models import Recipe
+from rest_framework.test import APIClient
+from user.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+LATENCY_BUDGET = 1.0
+
+
+def measure(client, method, path, params=None):
+    """Ответ, число запросов к базе и время при пустых кэшах."""
+    cache.clear()
+    token_cache.clear()
+    with mock.patch.object(tags, '_registry', None):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, params)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+    return response, len(context.captured_queries), elapsed
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryCountTestCase(TestCase):
+    """Число запросов к базе не зависит от объёма выдачи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_data', users=10, recipes=60, ingredients=50,
+            favorites=20, cart=10, follows=5, stdout=StringIO(),
+        )
+        cls.user = User.objects.get(username=f'{PREFIX}0')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, path, params=None, client=None):
+        response, queries, _ = measure(
+            client or self.client, 'get', path, params
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return queries, response
+
+    def assert_constant(self, path, params=None, client=None):
+        counts = []
+        for limit in (1, 50):
+            count, response = self.count_queries(
+                path, {**(params or {}), 'limit': limit}, client
+            )
+            self.assertEqual(
+                len(response.json()['results']),
+                min(limit, response.json()['count']),
+            )
+            counts.append(count)
+        self.assertEqual(counts[0], counts[1], f'{path} {params}')
+
+    def test_recipe_list(self):
+        self.assert_constant('/api/recipes/')
+
+    def test_recipe_list_anonymous(self):
+        self.assert_constant(
+            '/api/recipes/', client=APIClient(HTTP_X_CACHE_BYPASS='1')
+        )
+
+    def test_recipe_list_filtered(self):
+        self.assert_constant(
+            '/api/recipes/', {'tags': ['seed-0', 'seed-1', 'seed-2']}
+        )
+        self.assert_constant('/api/recipes/', {'is_favorited': 1})
+        self.assert_constant('/api/recipes/', {'is_in_shopping_cart': 1})
+
+    def test_subscriptions(self):
+        self.assert_constant('/api/users/subscriptions/')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class LargeRelationsTestCase(TestCase):
+    """Избранное и список покупок на 10 000 рецептов у пользователя.
+
+    Число запросов не зависит от числа связей, время ответа укладывается
+    в LATENCY_BUDGET.
+    """
+    recipes = 10000
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_data', users=1, recipes=cls.recipes, ingredients=50,
+            per_recipe=(1, 3), favorites=cls.recipes, cart=cls.recipes,
+            follows=0, stdout=StringIO(),
+        )
+        cls.user = User.objects.get(username=f'{PREFIX}0')
+        cls.recipe = Recipe.objects.order_by('pk').first()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_fast(self, method, path, params=None, status=200,
+                    queries=None):
+        response, count, elapsed = measure(
+            self.client, method, path, params
+        )
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(count, queries, f'{method} {path} {params}')
+        self.assertLess(elapsed, LATENCY_BUDGET, f'{method} {path}')
+        return response
+
+    def test_filters(self):
+        response = self.assert_fast(
+            'get', '/api/recipes/', {'is_favorited': 1, 'limit': 50},
+            queries=6,
+        )
+        self.assertEqual(response.json()['count'], self.recipes)
+        self.assertTrue(all(
+            recipe['is_favorited'] for recipe in response.json()['results']
+        ))
+        self.assert_fast(
+            'get', '/api/recipes/',
+            {'is_in_shopping_cart': 1, 'tags': 'seed-1', 'limit': 50},
+            queries=6,
+        )
+        response = self.assert_fast(
+            'get', '/api/recipes/', {'is_favorited': 0}, queries=2
+        )
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_favorite(self):
+        path = f'/api/recipes/{self.recipe.pk}/favorite/'
+        self.assert_fast('delete', path, status=204, queries=4)
+        self.assert_fast('post', path, status=201, queries=5)
+        self.assert_fast('post', path, status=400, queries=4)
+
+    def test_shopping_cart(self):
+        path = f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+        self.assert_fast('delete', path, status=204, queries=4)
+        self.assert_fast('post', path, status=201, queries=5)
+        self.assert_fast('post', path, status=400, queries=4)
+
+    def test_download_shopping_cart(self):
+        for file_format in ('txt', 'csv', 'json'):
+            self.assert_fast(
+                'get', '/api/recipes/download_shopping_cart/',
+                {'file_format': file_format}, queries=1,
+            )
@@ -0,0 +1,46 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from recipe.management.commands.check_query_plans import (full_scans,
+                                                          hot_queries)
+from recipe.management.commands.seed_data import PREFIX
+from recipe.models import Recipe
+from user.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryPlanTestCase(TestCase):
+    """Основные запросы обслуживаются индексами на заполненной базе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_data', users=50, recipes=500, ingredients=500,
+            stdout=StringIO(),
+        )
+        cls.user = User.objects.get(username=f'{PREFIX}0')
+        cls.recipe = Recipe.objects.filter(author=cls.user).first()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_no_full_scans(self):
+        queries = hot_queries(self.user.pk, self.recipe.pk)
+        with connection.cursor() as cursor:
+            for name, queryset in queries.items():
+                with self.subTest(name):
+                    sql, params = queryset.query.sql_with_params()
+                    self.assertEqual(full_scans(cursor, sql, params), [])
+
+    def test_command(self):
+        output = StringIO()
+        call_command('check_query_plans', stdout=output)
+        self.assertNotIn('полный просмотр', output.getvalue())
@@ -0,0 +1,50 @@
+from django.test import TestCase
+from recipe.models import AmountIngredient, Ingredient, Recipe, SimilarRecipe
+from recipe.recommendations import build_similar
+from user.models import User
+
+
+class SimilarRecipesTestCase(TestCase):
+    """Частичный пересчёт похожих рецептов обновляет обе стороны."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pw'
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(6)
+        )
+        cls.soup = cls.create('Суп', 0, 1)
+        cls.create('Каша', 0, 2)
+        cls.create('Салат', 3, 4)
+        cls.create('Омлет', 4, 5)
+        cls.create('Пирог', 5, 3)
+
+    @classmethod
+    def create(cls, name, *ingredients):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=name, text='Готовить.',
+            cooking_time=10, image='recipe/image/x.png',
+        )
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(
+                recipe=recipe, ingredients=cls.ingredients[number], amount=1
+            )
+            for number in ingredients
+        )
+        return recipe
+
+    def similar(self, recipe):
+        return list(SimilarRecipe.objects.filter(
+            recipe=recipe
+        ).values_list('similar__name', flat=True))
+
+    def test_new_recipe_enters_neighbour_lists(self):
+        build_similar(k=1)
+        self.assertEqual(self.similar(self.soup), ['Каша'])
+        twin = self.create('Суп второй', 0, 1)
+        build_similar([twin.pk], k=1)
+        self.assertEqual(self.similar(twin), ['Суп'])
+        self.assertEqual(self.similar(self.soup), ['Суп второй'])
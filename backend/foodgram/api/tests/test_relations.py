@@ -0,0 +1,61 @@
+import shutil
+import tempfile
+
+from api.relations import load_ids
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recipe.models import FavoriteRecipe, Recipe
+from rest_framework.test import APIClient
+from user.models import User
+
+CACHE_DIR = tempfile.mkdtemp()
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': CACHE_DIR,
+}}
+
+
+class RelationCacheTestCase(TestCase):
+    """Множества id связей кэшируются только в общем кэше."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pw'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Каша', text='Варить.',
+            cooking_time=20, image='recipe/image/porridge.png',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def is_favorited(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/')
+        return response.json()['is_favorited']
+
+    def test_local_cache_reads_database(self):
+        self.assertFalse(self.is_favorited())
+        # Как запись из другого процесса: без сигналов этого процесса.
+        FavoriteRecipe.objects.bulk_create(
+            [FavoriteRecipe(user=self.user, recipe=self.recipe)]
+        )
+        self.assertTrue(self.is_favorited())
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_shared_cache_keeps_ids(self):
+        cache.clear()
+        load_ids(self.user.pk, FavoriteRecipe)
+        with CaptureQueriesContext(connection) as context:
+            load_ids(self.user.pk, FavoriteRecipe)
+        self.assertEqual(len(context.captured_queries), 0)
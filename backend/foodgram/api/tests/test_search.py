@@ -0,0 +1,55 @@
+from django.test import TestCase
+from recipe.models import AmountIngredient, Ingredient, Recipe
+from recipe.search import search_recipes, update_search_index
+from user.models import User
+
+
+class SearchRecipesTestCase(TestCase):
+    """Полнотекстовый поиск рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pw'
+        )
+        cls.by_name = Recipe.objects.create(
+            author=author, name='Суп гороховый', text='Варить час.',
+            cooking_time=60, image='recipe/image/soup.png',
+        )
+        cls.by_text = Recipe.objects.create(
+            author=author, name='Гренки', text='Подавать к супу.',
+            cooking_time=10, image='recipe/image/bread.png',
+        )
+        cls.by_ingredient = Recipe.objects.create(
+            author=author, name='Рагу', text='Тушить.',
+            cooking_time=40, image='recipe/image/stew.png',
+        )
+        AmountIngredient.objects.create(
+            recipe=cls.by_ingredient,
+            ingredients=Ingredient.objects.create(
+                name='горох', measurement_unit='г'
+            ),
+            amount=100,
+        )
+        update_search_index()
+
+    def search(self, term):
+        return list(search_recipes(Recipe.objects.all(), term))
+
+    def test_ranked_by_weighted_columns(self):
+        self.assertEqual(
+            self.search('горох'), [self.by_name, self.by_ingredient]
+        )
+        self.assertEqual(self.search('суп'), [self.by_name, self.by_text])
+
+    def test_all_words_required(self):
+        self.assertEqual(self.search('суп час'), [self.by_name])
+        self.assertEqual(self.search('суп тушить'), [])
+        self.assertEqual(self.search('!!!'), [])
+
+    def test_rank_annotation(self):
+        ranks = [
+            recipe.rank
+            for recipe in search_recipes(Recipe.objects.all(), 'горох')
+        ]
+        self.assertGreater(ranks[0], ranks[1])
@@ -0,0 +1,59 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from api import tags
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recipe.models import Tag
+from rest_framework.test import APIClient
+
+CACHE_DIR = tempfile.mkdtemp()
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': CACHE_DIR,
+}}
+
+
+class TagRegistryTestCase(TestCase):
+    """Реестр тегов хранится в процессе только с общим кэшем."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag(name='Завтрак', slug='breakfast', color='#E26C2D').save()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(tags, '_registry', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def add_tag_elsewhere(self):
+        # Как изменение из другого процесса: без сигналов этого процесса.
+        Tag.objects.bulk_create(
+            [Tag(name='Ужин', slug='dinner', color='#8775D2')]
+        )
+
+    def test_local_cache_reads_database(self):
+        self.client.get('/api/tags/')
+        self.add_tag_elsewhere()
+        response = self.client.get('/api/recipes/', {'tags': 'dinner'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.client.get('/api/tags/').json()), 2)
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_shared_cache_keeps_registry(self):
+        cache.clear()
+        self.client.get('/api/tags/')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/tags/')
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(len(context.captured_queries), 0)
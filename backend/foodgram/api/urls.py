@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
-from .views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                    TagViewSet)
+from . import async_views
+from .views import (CustomUserViewSet, IngredientViewSet, MetricsView,
+                    RecipeViewSet, TagViewSet)
 
 app_name = 'api'
 router = routers.DefaultRouter()
@@ -14,7 +16,23 @@ router.register('users', CustomUserViewSet, basename='users')
 
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+async_urlpatterns = [
+    path('recipes/', async_views.recipes, name='recipes-list'),
+    path('recipes/<int:pk>/', async_views.recipe, name='recipes-detail'),
+    path(
+        'recipes/download_shopping_cart/',
+        async_views.download_shopping_cart,
+        name='recipes-download-shopping-cart',
+    ),
+    path('tags/', async_views.tags, name='tags-list'),
+    path('ingredients/', async_views.ingredients, name='ingredients-list'),
+]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_urlpatterns + urlpatterns
@@ -0,0 +1,189 @@
+import csv
+import json
+from datetime import datetime as dt
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from recipe.models import (AmountIngredient, FavoriteRecipe, Recipe,
+                           ShoppingList)
+from user.models import Follow, UserStats
+
+from .relations import update_relation
+
+RELATION_COUNTERS = {
+    FavoriteRecipe: (Recipe, 'favorites_count'),
+    ShoppingList: (Recipe, 'in_carts_count'),
+    Follow: (UserStats, 'followers_count'),
+}
+
+
+def update_counter(model, ids, delta):
+    """Атомарно меняет счётчик связи model у объектов ids на delta."""
+    if not ids:
+        return
+    counter_model, field = RELATION_COUNTERS[model]
+    counter_model.objects.filter(pk__in=ids).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def _relation_columns(model, field):
+    quote_name = connection.ops.quote_name
+    return (
+        quote_name(model._meta.db_table),
+        quote_name(model._meta.get_field('user').column),
+        quote_name(model._meta.get_field(field).column),
+    )
+
+
+def add_relations(model, field, user, ids):
+    """Создаёт связи user -> ids одним INSERT ... ON CONFLICT DO NOTHING.
+
+    Повторы отсекаются уникальным ограничением модели. Возвращает
+    список id, для которых связь действительно была создана; их счётчики
+    обновляются в той же транзакции, кэш связей — после её фиксации.
+    """
+    if not ids:
+        return []
+    table, user_column, column = _relation_columns(model, field)
+    values = ', '.join(['(%s, %s)'] * len(ids))
+    params = [value for pk in ids for value in (user.pk, pk)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {column}) '
+            f'VALUES {values} ON CONFLICT DO NOTHING RETURNING {column}',
+            params
+        )
+        added = [row[0] for row in cursor.fetchall()]
+        update_counter(model, added, 1)
+        update_relation(model, user.pk, added=added)
+    return added
+
+
+def remove_relations(model, field, user, ids):
+    """Удаляет связи user -> ids одним DELETE, возвращает удалённые id."""
+    if not ids:
+        return []
+    table, user_column, column = _relation_columns(model, field)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {column} IN ({placeholders}) RETURNING {column}',
+            [user.pk, *ids]
+        )
+        removed = [row[0] for row in cursor.fetchall()]
+        update_counter(model, removed, -1)
+        update_relation(model, user.pk, removed=removed)
+    return removed
+
+
+def get_recipes_limit(request):
+    """Значение recipes_limit из запроса или None."""
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return None
+    return max(limit, 0)
+
+
+def attach_recipe_previews(authors, limit=None):
+    """Загружает первые limit рецептов каждого автора одним запросом.
+
+    Рецепты отбираются оконной функцией ROW_NUMBER() по автору и
+    сохраняются в атрибут preview_recipes.
+    """
+    if not authors:
+        return
+    ids = [author.pk for author in authors]
+    if limit is None:
+        recipes = Recipe.objects.filter(author_id__in=ids).only(
+            'id', 'author_id', 'name', 'image', 'renditions_image',
+            'cooking_time',
+        )
+    else:
+        table = connection.ops.quote_name(Recipe._meta.db_table)
+        placeholders = ', '.join(['%s'] * len(ids))
+        recipes = Recipe.objects.raw(
+            'SELECT id, author_id, name, image, renditions_image, '
+            'cooking_time FROM ('
+            'SELECT id, author_id, name, image, renditions_image, '
+            'cooking_time, '
+            'ROW_NUMBER() OVER (PARTITION BY author_id '
+            'ORDER BY pub_date DESC, id DESC) AS position '
+            f'FROM {table} WHERE author_id IN ({placeholders})'
+            ') AS ranked WHERE position <= %s '
+            'ORDER BY author_id, position',
+            [*ids, limit]
+        )
+    previews = {pk: [] for pk in ids}
+    for recipe in recipes:
+        previews[recipe.author_id].append(recipe)
+    for author in authors:
+        author.preview_recipes = previews[author.pk]
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_cart(user):
+    """Суммарное количество ингредиентов из списка покупок одним запросом."""
+    return AmountIngredient.objects.filter(
+        recipe__in_shopping_list__user=user
+    ).values(
+        'ingredients__name', 'ingredients__measurement_unit'
+    ).annotate(
+        amount=Sum('amount')
+    ).order_by('ingredients__name', 'ingredients__measurement_unit')
+
+
+def shopping_cart_txt(user, shopping_cart):
+    yield (
+        f'Список покупок для: {user.username}\n'
+        f'{dt.now().strftime("%d/%m/%Y")}\n\n'
+    )
+    for ingredient in shopping_cart:
+        yield (
+            f' {ingredient["ingredients__name"].title()},'
+            f' {ingredient["ingredients__measurement_unit"]}'
+            f' - {ingredient["amount"]}\n'
+        )
+
+
+def shopping_cart_csv(user, shopping_cart):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in shopping_cart:
+        yield writer.writerow((
+            ingredient['ingredients__name'],
+            ingredient['ingredients__measurement_unit'],
+            ingredient['amount'],
+        ))
+
+
+def shopping_cart_json(user, shopping_cart):
+    yield '{"user": %s, "date": "%s", "ingredients": [' % (
+        json.dumps(user.username, ensure_ascii=False),
+        dt.now().strftime('%Y-%m-%d'),
+    )
+    separator = ''
+    for ingredient in shopping_cart:
+        yield separator + json.dumps({
+            'name': ingredient['ingredients__name'],
+            'measurement_unit': ingredient['ingredients__measurement_unit'],
+            'amount': ingredient['amount'],
+        }, ensure_ascii=False)
+        separator = ', '
+    yield ']}'
+
+
+SHOPPING_CART_FORMATS = {
+    'txt': (shopping_cart_txt, 'text/plain; charset=utf-8'),
+    'csv': (shopping_cart_csv, 'text/csv; charset=utf-8'),
+    'json': (shopping_cart_json, 'application/json'),
+}
@@ -1,44 +1,120 @@
-from datetime import datetime as dt
-
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http.response import HttpResponse
+from django.http.response import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from recipe.models import FavoriteRecipe, Ingredient, Recipe, ShoppingList, Tag
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.filters import OrderingFilter
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from user.models import Follow
 
+from .authentication import token_cache
+from .bulk import RecipeImporter, export_recipes
+from .cache import (INGREDIENTS, RECIPES, TAGS, AnonymousListCacheMixin,
+                    get_stats)
+from .catalog import IngredientCatalogMixin, download_response
+from .conditional import ConditionalGetMixin
 from .filters import CustomIngredientsSearchFilter, RecipeFilter
+from .instrumentation import InstrumentedViewMixin, render_metrics
+from .matching import ingredient_index
 from .pagination import CustomPageNumberPagination
 from .permissions import AdminOrAuthor, AdminOrReadOnly
-from .serializers import (AmountIngredient, CreateUpdateRecipeSerializer,
-                          FavoriteSerializator, FollowSerializer,
-                          IngredientSerializer, RecipeSerializer,
-                          ShoppingCartSerializer, TagSerializer)
+from .serializers import (CookRecipeSerializer, CreateUpdateRecipeSerializer,
+                          FollowSerializer, IngredientIdsSerializer,
+                          IngredientSerializer, RecipeIdsSerializer,
+                          RecipeSerializer, ShortRecipeSerializer,
+                          TagSerializer)
+from .tags import TagRegistryMixin
+from .utils import (SHOPPING_CART_FORMATS, add_relations,
+                    attach_recipe_previews, get_recipes_limit,
+                    get_shopping_cart, remove_relations)
 
 User = get_user_model()
 
+FAVORITE_MESSAGES = {
+    'exists': 'Рецепт уже есть в избранном',
+    'missing': 'Рецептa нет в избранном',
+    'removed': 'Рецепт удалён из избранного',
+}
+SHOPPING_CART_MESSAGES = {
+    'exists': 'Рецепт уже в списке покупок',
+    'missing': 'Рецептa нет в списке покупок',
+    'removed': 'Рецепт удалён из списка покупок',
+}
+
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(InstrumentedViewMixin, ConditionalGetMixin,
+                    AnonymousListCacheMixin, ModelViewSet):
     """Для работы с рецептами."""
     queryset = Recipe.objects.all()
     serializer_class = CreateUpdateRecipeSerializer
     permission_classes = (AdminOrAuthor, )
     pagination_class = CustomPageNumberPagination
-    filter_backends = (DjangoFilterBackend, )
+    filter_backends = (DjangoFilterBackend, OrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('pub_date', 'favorites_count')
+    lookup_value_regex = r'\d+'
+    cursor_ordering = ('-pub_date', '-id')
+
+    def get_queryset(self):
+        return Recipe.objects.with_related()
+
+    def get_validators(self, request):
+        # Счётчики избранного меняются без сдвига версии рецептов.
+        if 'favorites_count' in request.query_params.get('ordering', ''):
+            return None
+        return super().get_validators(request)
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeSerializer
         return CreateUpdateRecipeSerializer
 
+    def toggle_relation(self, request, model, pk, messages):
+        """Добавляет/удаляет связь пользователя с одним рецептом."""
+        if request.method == 'POST':
+            recipe = get_object_or_404(Recipe, pk=pk)
+            if not add_relations(model, 'recipe', request.user, [recipe.id]):
+                return Response(
+                    {messages['exists']}, status=status.HTTP_400_BAD_REQUEST
+                )
+            serializer = ShortRecipeSerializer(
+                recipe, context={'request': request}
+            )
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if not remove_relations(model, 'recipe', request.user, [pk]):
+            return Response(
+                {messages['missing']}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(messages['removed'], status=status.HTTP_204_NO_CONTENT)
+
+    def toggle_relations(self, request, model, messages):
+        """Добавляет/удаляет связи пользователя с несколькими рецептами."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            recipes = Recipe.objects.in_bulk(ids)
+            added = add_relations(
+                model, 'recipe', request.user, list(recipes)
+            )
+            serializer = ShortRecipeSerializer(
+                [recipes[pk] for pk in added],
+                many=True,
+                context={'request': request}
+            )
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if not remove_relations(model, 'recipe', request.user, ids):
+            return Response(
+                {messages['missing']}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(messages['removed'], status=status.HTTP_204_NO_CONTENT)
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -46,41 +122,21 @@ class RecipeViewSet(ModelViewSet):
     )
     def favorite(self, request, pk=None):
         """Добавляет/удаляет рецепт в Избранное."""
-        context = {'request': request}
-        user = self.request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        if request.method == 'POST':
-            if FavoriteRecipe.objects.filter(
-                user=user, recipe=recipe
-            ).exists():
-                message = {'Рецепт уже есть в избранном'}
-                return Response(message, status=status.HTTP_400_BAD_REQUEST)
-            data = {
-                'user': request.user.id,
-                'recipe': recipe.id
-            }
-            serializer = FavoriteSerializator(
-                data=data, context=context
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(
-                serializer.data, status=status.HTTP_201_CREATED)
+        return self.toggle_relation(
+            request, FavoriteRecipe, pk, FAVORITE_MESSAGES
+        )
 
-        if request.method == 'DELETE':
-            if not FavoriteRecipe.objects.filter(
-                user=user, recipe=recipe
-            ).exists():
-                message = {'Рецептa нет в избранном'}
-                return Response(message, status=status.HTTP_400_BAD_REQUEST)
-            favorite = get_object_or_404(
-                FavoriteRecipe, user=user, recipe=recipe)
-            favorite.delete()
-            return Response(
-                'Рецепт удалён из избранного',
-                status=status.HTTP_204_NO_CONTENT
-            )
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite',
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite_bulk(self, request):
+        """Добавляет/удаляет в Избранное несколько рецептов сразу."""
+        return self.toggle_relations(
+            request, FavoriteRecipe, FAVORITE_MESSAGES
+        )
 
     @action(
         detail=True,
@@ -89,40 +145,21 @@ class RecipeViewSet(ModelViewSet):
     )
     def shopping_cart(self, request, pk=None):
         """Добавляет/удаляет рецепт в Списке покупок."""
-        context = {'request': request}
-        user = self.request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        if request.method == 'POST':
-            if ShoppingList.objects.filter(user=user, recipe=recipe).exists():
-                message = {'Рецепт уже в списке покупок'}
-                return Response(message, status=status.HTTP_400_BAD_REQUEST)
-            data = {
-                'user': request.user.id,
-                'recipe': recipe.id
-            }
-            serializer = ShoppingCartSerializer(data=data, context=context)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(
-                serializer.data, status=status.HTTP_201_CREATED)
-
-        if request.method == 'DELETE':
-            if not ShoppingList.objects.filter(
-                user=user, recipe=recipe
-            ).exists():
-                message = {'Рецептa нет в списке покупок'}
-                return Response(message, status=status.HTTP_400_BAD_REQUEST)
-
-            shopping_list = get_object_or_404(
-                ShoppingList, user=user, recipe=recipe
-            )
-            shopping_list.delete()
-            return Response(
-                'Рецепт удалён из списка покупок',
-                status=status.HTTP_204_NO_CONTENT
-            )
+        return self.toggle_relation(
+            request, ShoppingList, pk, SHOPPING_CART_MESSAGES
+        )
 
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_bulk(self, request):
+        """Добавляет/удаляет в Списке покупок несколько рецептов сразу."""
+        return self.toggle_relations(
+            request, ShoppingList, SHOPPING_CART_MESSAGES
+        )
 
     @action(
         detail=False,
@@ -130,60 +167,143 @@ class RecipeViewSet(ModelViewSet):
         permission_classes=[IsAuthenticated]
     )
     def download_shopping_cart(self, request):
-        """Загружает файл *.txt со списком покупок."""
+        """Загружает список покупок в формате txt, csv или json."""
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_CART_FORMATS:
+            message = {
+                'file_format': 'Допустимые форматы: '
+                + ', '.join(SHOPPING_CART_FORMATS)
+            }
+            return Response(message, status=status.HTTP_400_BAD_REQUEST)
+        export, content_type = SHOPPING_CART_FORMATS[file_format]
         user = self.request.user
-        shopping_list = AmountIngredient.objects.filter(
-            recipe__in_shopping_list__user=request.user
-        ).values('ingredients').annotate(
-            amount=Sum('amount')
+        response = StreamingHttpResponse(
+            export(user, get_shopping_cart(user).iterator()),
+            content_type=content_type
         )
-        shopping_cart_file = (
-            f'Список покупок для: {user.username}\n'
-            f'{dt.now().strftime("%d/%m/%Y")}\n\n'
+        response['Content-Disposition'] = (
+            'attachment; filename="shopping_list.%s"' % file_format
         )
-        for ingredient in shopping_list:
-            position_ingredient = get_object_or_404(
-                Ingredient,
-                pk=ingredient['ingredients']
-            )
-            position_amount = ingredient['amount']
-            shopping_cart_file += (
-                f' {position_ingredient.name.title()},'
-                f' {position_ingredient.measurement_unit}'
-                f' - {position_amount}' + '\n'
-            )
-        response = HttpResponse(
-            shopping_cart_file,
-            content_type='text'
+        return response
+
+    @action(detail=True, methods=['get'], pagination_class=None)
+    def similar(self, request, pk=None):
+        """Похожие рецепты, рассчитанные заранее."""
+        recipes = Recipe.objects.filter(
+            similar_for__recipe_id=pk
+        ).order_by('-similar_for__score', '-id')
+        serializer = ShortRecipeSerializer(
+            recipes, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        pagination_class=None,
+        permission_classes=[IsAuthenticated]
+    )
+    def recommended(self, request):
+        """Рекомендации по избранному, рассчитанные заранее."""
+        recipes = Recipe.objects.filter(
+            recommended_to__user=request.user
+        ).order_by('-recommended_to__score', '-id')
+        serializer = ShortRecipeSerializer(
+            recipes, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'], cursor_ordering=None)
+    def cook(self, request):
+        """Рецепты из имеющихся ингредиентов: сначала с большим покрытием."""
+        data = {'ingredients': [
+            pk for value in request.query_params.getlist('ingredients')
+            for pk in value.split(',') if pk
+        ]}
+        if 'max_missing' in request.query_params:
+            data['max_missing'] = request.query_params['max_missing']
+        serializer = IngredientIdsSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        recipes, coverage, missing = ingredient_index.get().match(
+            serializer.validated_data['ingredients'],
+            serializer.validated_data.get('max_missing'),
+        )
+        page = self.paginate_queryset(range(len(recipes)))
+        found = self.get_queryset().in_bulk(
+            [int(recipes[position]) for position in page]
+        )
+        results = []
+        for position in page:
+            recipe = found.get(int(recipes[position]))
+            if recipe is None:
+                continue
+            recipe.coverage = round(float(coverage[position]), 3)
+            recipe.missing = int(missing[position])
+            results.append(recipe)
+        serializer = CookRecipeSerializer(
+            results, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        permission_classes=[IsAdminUser]
+    )
+    def bulk_import(self, request):
+        """Импорт рецептов из тела запроса в формате JSON Lines."""
+        report = RecipeImporter(request.user).run(request.stream or [])
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='export',
+        permission_classes=[IsAdminUser]
+    )
+    def bulk_export(self, request):
+        """Потоковая выгрузка всех рецептов в формате JSON Lines."""
+        response = StreamingHttpResponse(
+            export_recipes(), content_type='application/x-ndjson'
         )
         response['Content-Disposition'] = (
-            'attachment; filename="%s"' % 'shopping_list.txt'
+            'attachment; filename="recipes.jsonl"'
         )
         return response
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(InstrumentedViewMixin, ConditionalGetMixin,
+                 TagRegistryMixin, ReadOnlyModelViewSet):
     """Для работы с тегами."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AdminOrReadOnly, )
     pagination_class = None
     http_method_names = ['get']
+    conditional_versions = (TAGS, )
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(InstrumentedViewMixin, ConditionalGetMixin,
+                        IngredientCatalogMixin, ReadOnlyModelViewSet):
     """Для работы с ингредиентами."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AdminOrReadOnly, )
     pagination_class = None
     filter_backends = (CustomIngredientsSearchFilter, )
-    search_fields = ('^name', 'name')
     http_method_names = ['get']
+    conditional_versions = (INGREDIENTS, )
+
+    @action(detail=False, url_path='catalog')
+    def download_catalog(self, request):
+        """Сжатый снимок каталога для автодополнения без сети."""
+        return download_response(request)
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(InstrumentedViewMixin, UserViewSet):
     queryset = User.objects.all()
+    lookup_value_regex = r'\d+'
     pagination_class = CustomPageNumberPagination
 
     @action(
@@ -193,12 +313,16 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request):
-        user = self.request.user
-        user_subscriptions = user.follower.all()
-        authors = [item.author.id for item in user_subscriptions]
-        queryset = User.objects.filter(pk__in=authors)
-        paginated_queryset = self.paginate_queryset(queryset)
-        serializer = self.get_serializer(paginated_queryset, many=True)
+        queryset = Follow.objects.filter(
+            user=request.user
+        ).select_related('author__stats')
+        authors = [follow.author for follow in self.paginate_queryset(
+            queryset
+        )]
+        for author in authors:
+            author.is_subscribed = True
+        attach_recipe_previews(authors, get_recipes_limit(request))
+        serializer = self.get_serializer(authors, many=True)
         return self.get_paginated_response(serializer.data)
 
     @action(
@@ -208,39 +332,42 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticated]
     )
     def subscribe(self, request, id=None):
-        user = get_object_or_404(User, username=request.user.username)
-        author = get_object_or_404(User, pk=id)
-
         if self.request.method == 'POST':
-            if user.id == author.id:
+            author = get_object_or_404(User, pk=id)
+            if request.user.id == author.id:
                 message = {'Нельзя подписаться на самого себя'}
                 return Response(message, status=status.HTTP_400_BAD_REQUEST)
-            if Follow.objects.filter(
-                user=user,
-                author=author
-            ).exists():
+            if not add_relations(Follow, 'author', request.user, [author.id]):
                 message = {'Вы уже подписаны на этого автора'}
                 return Response(message, status=status.HTTP_400_BAD_REQUEST)
-            Follow.objects.create(user=user, author=author)
-            follows = User.objects.all().filter(username=author)
+            author.is_subscribed = True
             serializer = FollowSerializer(
-                follows, context={'request': request}, many=True,
+                author, context={'request': request}
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        if self.request.method == 'DELETE':
-            if not Follow.objects.filter(
-                user=user,
-                author=author
-            ).exists():
-                message = {'Вы не подписаны на этого автора'}
-                return Response(message, status=status.HTTP_400_BAD_REQUEST)
-            subscription = get_object_or_404(
-                Follow,
-                user=user,
-                author=author
-            )
-            subscription.delete()
+        if not remove_relations(Follow, 'author', request.user, [id]):
+            message = {'Вы не подписаны на этого автора'}
+            return Response(message, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+class MetricsView(APIView):
+    """Метрики процесса в формате Prometheus."""
+    permission_classes = (IsAdminUser, )
+
+    def get(self, request):
+        extra = [
+            (f'foodgram_cache_{name}_total', {'cache': RECIPES}, value)
+            for name, value in get_stats(RECIPES).items()
+        ]
+        tokens = token_cache.get_stats()
+        extra += [
+            ('foodgram_token_cache_lookups_total', {'result': result},
+             tokens[result])
+            for result in ('local', 'shared', 'miss')
+        ]
+        return HttpResponse(
+            render_metrics(extra),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
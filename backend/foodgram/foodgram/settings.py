@@ -29,6 +29,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'colorfield',
     'rest_framework',
     'rest_framework.authtoken',
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,10 +85,14 @@ DJOSER = {
 
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+# Асинхронные представления для читающих эндпоинтов, включает foodgram.asgi.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '0') == '1'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -114,6 +120,52 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+RECIPE_FEED_CACHE_TIMEOUT = int(os.getenv('RECIPE_FEED_CACHE_TIMEOUT', 300))
+COOK_CHANGES_TIMEOUT = int(os.getenv('COOK_CHANGES_TIMEOUT', 3600))
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 300))
+TOKEN_CACHE_SHARED = os.getenv('TOKEN_CACHE_SHARED', '0') == '1'
+
+RELATION_CACHE_TIMEOUT = int(os.getenv('RELATION_CACHE_TIMEOUT', 3600))
+
+INGREDIENT_CATALOG_PATH = os.getenv(
+    'INGREDIENT_CATALOG_PATH',
+    os.path.join(BASE_DIR, 'catalog', 'ingredients.bin'),
+)
+
+INSTRUMENTATION_SAMPLE_RATE = float(
+    os.getenv('INSTRUMENTATION_SAMPLE_RATE', 0.05)
+)
+INSTRUMENTATION_SLOW_MS = int(os.getenv('INSTRUMENTATION_SLOW_MS', 500))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'loggers': {
+        'foodgram.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -160,4 +212,6 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
@@ -50,6 +50,7 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'name',
         'author',
+        'favorites_count',
     )
     search_fields = (
         'name', 'author',
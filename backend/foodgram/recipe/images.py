@@ -0,0 +1,158 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+from recipe.models import Recipe
+
+UPLOAD_TO = 'recipe/image'
+RENDITIONS_DIR = f'{UPLOAD_TO}/renditions'
+EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+RENDITIONS = {
+    'card': ((480, 480), 'JPEG'),
+    'detail': ((1280, 1280), 'JPEG'),
+    'webp': ((1280, 1280), 'WEBP'),
+}
+
+_executor = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            thread_name_prefix='recipe-image',
+        )
+    return _executor
+
+
+def verify_image(file):
+    """Расширение для формата изображения file или ValueError.
+
+    Как и ImageField, считает некорректным файл, на котором Pillow
+    падает с любым исключением, в том числе DecompressionBombError.
+    """
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            image.verify()
+            image_format = image.format
+    except Exception as error:
+        raise ValueError('Файл не является изображением') from error
+    if image_format not in EXTENSIONS:
+        raise ValueError(f'Неподдерживаемый формат: {image_format}')
+    return EXTENSIONS[image_format]
+
+
+def save_original(file):
+    """Сохраняет загруженный файл под именем из sha256 его содержимого.
+
+    Одинаковые изображения хранятся один раз. Возвращает имя файла
+    в хранилище; если изображение не распознано, бросает ValueError.
+    """
+    extension = verify_image(file)
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(1 << 16), b''):
+        digest.update(chunk)
+    name = f'{UPLOAD_TO}/{digest.hexdigest()}.{extension}'
+    if not default_storage.exists(name):
+        file.seek(0)
+        name = default_storage.save(name, file)
+    return name
+
+
+def rendition_name(name, rendition):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    image_format = RENDITIONS[rendition][1]
+    return f'{RENDITIONS_DIR}/{stem}_{rendition}.{EXTENSIONS[image_format]}'
+
+
+def rendition_urls(name, ready=False):
+    """URL всех вариантов изображения по имени оригинала.
+
+    ready — варианты построены (Recipe.renditions_image), иначе вместо
+    них отдаётся URL оригинала. Хранилище не опрашивается.
+    """
+    if not name:
+        return {}
+    if not ready:
+        original = default_storage.url(name)
+        return {rendition: original for rendition in RENDITIONS}
+    return {
+        rendition: default_storage.url(rendition_name(name, rendition))
+        for rendition in RENDITIONS
+    }
+
+
+def build_renditions(name):
+    """Создаёт недостающие варианты изображения name.
+
+    Затем отмечает их готовность у рецептов с этим изображением.
+    """
+    missing = [
+        rendition for rendition in RENDITIONS
+        if not default_storage.exists(rendition_name(name, rendition))
+    ]
+    if missing:
+        _build(name, missing)
+    Recipe.objects.filter(image=name).exclude(
+        renditions_image=name
+    ).update(renditions_image=name)
+
+
+def _build(name, missing):
+    with default_storage.open(name) as file, Image.open(file) as original:
+        original = ImageOps.exif_transpose(original)
+        for rendition in missing:
+            size, image_format = RENDITIONS[rendition]
+            image = original.copy()
+            image.thumbnail(size)
+            if image_format == 'JPEG' and image.mode != 'RGB':
+                image = image.convert('RGB')
+            buffer = BytesIO()
+            image.save(buffer, image_format, quality=85)
+            default_storage.save(
+                rendition_name(name, rendition), ContentFile(buffer.getvalue())
+            )
+
+
+def schedule_renditions(name):
+    """Ставит построение вариантов в пул потоков вне запроса.
+
+    Повторная постановка того же изображения, пока задача не выполнена,
+    пропускается.
+    """
+    with _pending_lock:
+        if name in _pending:
+            return None
+        _pending.add(name)
+    future = get_executor().submit(_build_in_background, name)
+    future.add_done_callback(lambda _: _finish(name))
+    return future
+
+
+def _build_in_background(name):
+    try:
+        build_renditions(name)
+    finally:
+        close_old_connections()
+
+
+def _finish(name):
+    with _pending_lock:
+        _pending.discard(name)
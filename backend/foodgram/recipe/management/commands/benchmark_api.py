@@ -0,0 +1,346 @@
+import base64
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import threading
+import time
+import tracemalloc
+from io import BytesIO
+
+import django
+from api.cache import is_cache_shared
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from recipe.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .seed_data import PREFIX
+
+User = get_user_model()
+
+LARGE_IMAGE_BYTES = 5 * 2 ** 20
+WORDS = ('суп', 'салат', 'пирог', 'паста', 'соус')
+
+
+def encode_image(image, image_format='PNG'):
+    buffer = BytesIO()
+    image.save(buffer, image_format)
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def current_rss():
+    """Резидентная память процесса в байтах (Linux, /proc)."""
+    try:
+        with open('/proc/self/statm') as file:
+            pages = int(file.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+class RssSampler:
+    """Пик резидентной памяти (RSS) процесса за время блока with.
+
+    RSS опрашивается из /proc каждые interval секунд в отдельном потоке.
+    Без /proc берётся ru_maxrss — пик за всё время жизни процесса.
+    """
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def sample(self):
+        rss = current_rss()
+        if rss is None:
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        self.peak = max(self.peak, rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+class Command(BaseCommand):
+    """Замеряет основные сценарии API на данных из seed_data.
+
+    Для каждого сценария выводятся перцентили задержки, число запросов
+    к базе, пик резидентной памяти процесса (RSS, как у воркера) и пик
+    памяти Python (tracemalloc) на запрос. Изменяющие
+    сценарии выполняются в откатываемой транзакции. Результат можно
+    сохранить (--output) и сравнить с сохранённым ранее (--compare):
+    рост числа запросов — регрессия всегда, рост p95 — если он больше
+    --tolerance (с --queries-only задержка не сравнивается).
+    """
+    scenarios = (
+        'recipes_anonymous',
+        'recipes_anonymous_cached',
+        'recipes_authenticated',
+        'recipes_not_modified',
+        'recipes_filtered',
+        'recipes_search',
+        'shopping_cart',
+        'subscriptions',
+        'ingredient_autocomplete',
+        'recipe_create',
+        'recipe_create_large_image',
+        'recipe_update',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--profile-requests', type=int, default=3)
+        parser.add_argument('--scenario', action='append',
+                            choices=self.scenarios)
+        parser.add_argument('--output')
+        parser.add_argument('--compare')
+        parser.add_argument('--tolerance', type=float, default=0.25)
+        parser.add_argument('--queries-only', action='store_true')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.setup(options['seed'])
+        results = {}
+        for name in options['scenario'] or self.scenarios:
+            request = getattr(self, name)
+            results[name] = self.measure(
+                name, request, options['requests'],
+                options['profile_requests'],
+            )
+            self.report(name, results[name])
+        data = {'meta': self.meta(options), 'scenarios': results}
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(data, file, ensure_ascii=False, indent=2)
+                file.write('\n')
+        if options['compare']:
+            self.compare(results, options)
+
+    def setup(self, seed):
+        self.rng = random.Random(seed)
+        self.user = User.objects.filter(
+            username__startswith=PREFIX
+        ).order_by('pk').first()
+        if self.user is None:
+            raise CommandError('Нет данных, сначала выполните seed_data.')
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.tags = list(Tag.objects.values_list('pk', 'slug'))
+        self.ingredients = list(
+            Ingredient.objects.values_list('pk', 'name')[:1000]
+        )
+        self.own_recipe = Recipe.objects.filter(author=self.user).first()
+        self.small_image = encode_image(Image.new('RGB', (64, 64), 'green'))
+        side = int((LARGE_IMAGE_BYTES / 3) ** 0.5)
+        self.large_image = encode_image(Image.frombytes(
+            'RGB', (side, side), os.urandom(side * side * 3)
+        ))
+        self.created = 0
+        # Без общего кэша ETag не выдаётся, запрос получит полный ответ.
+        self.etag = self.client.get('/api/recipes/', {'page': 1}).get(
+            'ETag', ''
+        )
+
+    def meta(self, options):
+        return {
+            'vendor': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'cache_shared': is_cache_shared(),
+            'requests': options['requests'],
+            'users': User.objects.count(),
+            'recipes': Recipe.objects.count(),
+            'ingredients': Ingredient.objects.count(),
+        }
+
+    def run(self, request):
+        response = request()
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{response.status_code}: {response.content[:200]!r}'
+            )
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def measure(self, name, request, count, profile_count):
+        self.run(request)
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            self.run(request)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = []
+        peaks = []
+        rss = []
+        for _ in range(profile_count):
+            with RssSampler() as sampler:
+                with CaptureQueriesContext(connection) as context:
+                    self.run(request)
+            rss.append(sampler.peak)
+            queries.append(len(context.captured_queries))
+            tracemalloc.start()
+            self.run(request)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        timings.sort()
+        return {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'queries': max(queries, default=0),
+            'rss_kib': round(max(rss, default=0) / 1024),
+            'peak_kib': round(max(peaks, default=0) / 1024),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<28} p50 {result["p50_ms"]:>8.2f} ms  '
+            f'p95 {result["p95_ms"]:>8.2f} ms  '
+            f'p99 {result["p99_ms"]:>8.2f} ms  '
+            f'запросов {result["queries"]:>3}  '
+            f'RSS {result["rss_kib"]:>7} KiB  '
+            f'Python {result["peak_kib"]:>6} KiB'
+        )
+
+    def compare(self, results, options):
+        with open(options['compare'], encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline['meta'].get('cache_shared', True) != is_cache_shared():
+            raise CommandError(
+                'Базовая линия снята с другим видом кэша: задайте '
+                'CACHE_BACKEND, как при её записи.'
+            )
+        baseline = baseline['scenarios']
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            expected = baseline[name]
+            if result['queries'] > expected['queries']:
+                regressions.append(
+                    f'{name}: запросов {expected["queries"]} -> '
+                    f'{result["queries"]}'
+                )
+            limit = expected['p95_ms'] * (1 + options['tolerance'])
+            if not options['queries_only'] and result['p95_ms'] > limit:
+                regressions.append(
+                    f'{name}: p95 {expected["p95_ms"]} -> '
+                    f'{result["p95_ms"]} ms'
+                )
+        if regressions:
+            raise CommandError('Регрессии:\n' + '\n'.join(regressions))
+        self.stdout.write('Регрессий нет.')
+
+    def rollback(self, request):
+        with transaction.atomic():
+            response = request()
+            transaction.set_rollback(True)
+        return response
+
+    def recipe_payload(self, image):
+        self.created += 1
+        return {
+            'name': f'Benchmark {self.created}',
+            'text': ' '.join(self.rng.choices(WORDS, k=20)),
+            'cooking_time': self.rng.randint(5, 60),
+            'image': image,
+            'tags': [pk for pk, _ in self.rng.sample(self.tags, 1)],
+            'ingredients': [
+                {'id': pk, 'amount': self.rng.randint(1, 500)}
+                for pk, _ in self.rng.sample(self.ingredients, 8)
+            ],
+        }
+
+    def recipes_anonymous(self):
+        return self.anonymous.get(
+            '/api/recipes/', {'page': self.rng.randint(1, 5)},
+            HTTP_X_CACHE_BYPASS='1',
+        )
+
+    def recipes_anonymous_cached(self):
+        return self.anonymous.get('/api/recipes/', {'page': 1})
+
+    def recipes_authenticated(self):
+        return self.client.get(
+            '/api/recipes/', {'page': self.rng.randint(1, 5)}
+        )
+
+    def recipes_not_modified(self):
+        return self.client.get(
+            '/api/recipes/', {'page': 1}, HTTP_IF_NONE_MATCH=self.etag
+        )
+
+    def recipes_filtered(self):
+        return self.client.get('/api/recipes/', {
+            'tags': self.rng.choice(self.tags)[1],
+            'is_favorited': self.rng.choice((0, 1)),
+        })
+
+    def recipes_search(self):
+        return self.client.get(
+            '/api/recipes/', {'search': self.rng.choice(WORDS)}
+        )
+
+    def shopping_cart(self):
+        return self.client.get('/api/recipes/download_shopping_cart/')
+
+    def subscriptions(self):
+        return self.client.get(
+            '/api/users/subscriptions/', {'recipes_limit': 3}
+        )
+
+    def ingredient_autocomplete(self):
+        name = self.rng.choice(self.ingredients)[1]
+        return self.anonymous.get(
+            '/api/ingredients/', {'name': name[:self.rng.randint(1, 4)]}
+        )
+
+    def recipe_create(self):
+        return self.rollback(lambda: self.client.post(
+            '/api/recipes/', self.recipe_payload(self.small_image),
+            format='json',
+        ))
+
+    def recipe_create_large_image(self):
+        return self.rollback(lambda: self.client.post(
+            '/api/recipes/', self.recipe_payload(self.large_image),
+            format='json',
+        ))
+
+    def recipe_update(self):
+        if self.own_recipe is None:
+            raise CommandError('У пользователя нет рецептов для обновления.')
+        payload = self.recipe_payload(self.small_image)
+        del payload['image'], payload['name']
+        return self.rollback(lambda: self.client.patch(
+            f'/api/recipes/{self.own_recipe.pk}/', payload, format='json'
+        ))
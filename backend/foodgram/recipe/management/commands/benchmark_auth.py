@@ -0,0 +1,105 @@
+import random
+import statistics
+import time
+
+from api.authentication import CachedTokenAuthentication, token_cache
+from api.cache import is_cache_shared
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from .benchmark_api import percentile
+from .seed_data import PREFIX
+
+User = get_user_model()
+
+AUTHENTICATION_CLASSES = {
+    'token': TokenAuthentication,
+    'cached': CachedTokenAuthentication,
+}
+
+
+class CurrentUserView(APIView):
+    permission_classes = (IsAuthenticated, )
+
+    def get(self, request):
+        return Response({'id': request.user.pk})
+
+
+class Command(BaseCommand):
+    """Пропускная способность аутентифицированных запросов.
+
+    Запросы с токенами --users пользователей из seed_data проходят
+    полный цикл представления DRF (аутентификация, права, рендеринг)
+    с TokenAuthentication и с CachedTokenAuthentication. Выводятся
+    запросов в секунду, перцентили, число запросов к базе на запрос
+    и доля попаданий в кэш токенов.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(
+            username__startswith=PREFIX
+        ).order_by('pk')[:options['users']])
+        if not users:
+            raise CommandError('Нет данных, сначала выполните seed_data.')
+        if not is_cache_shared():
+            self.stderr.write(
+                'Кэш по умолчанию не общий: кэш токенов отключён, задайте '
+                'CACHE_BACKEND.'
+            )
+        keys = [
+            Token.objects.get_or_create(user=user)[0].key for user in users
+        ]
+        rng = random.Random(options['seed'])
+        factory = APIRequestFactory()
+        requests = [
+            factory.get('/', HTTP_AUTHORIZATION=f'Token {rng.choice(keys)}')
+            for _ in range(options['requests'])
+        ]
+        for name, authentication in AUTHENTICATION_CLASSES.items():
+            token_cache.clear()
+            view = CurrentUserView.as_view(
+                authentication_classes=(authentication, )
+            )
+            self.report(name, self.measure(view, requests))
+
+    def measure(self, view, requests):
+        timings = []
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            for request in requests:
+                request_started = time.perf_counter()
+                response = view(request)
+                timings.append((time.perf_counter() - request_started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'Ответ {response.status_code}.')
+            elapsed = time.perf_counter() - started
+        timings.sort()
+        return {
+            'rps': len(requests) / elapsed,
+            'p50_ms': statistics.median(timings),
+            'p99_ms': percentile(timings, 0.99),
+            'queries': len(context.captured_queries) / len(requests),
+            'hit_ratio': token_cache.get_stats()['hit_ratio'],
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<8} rps {result["rps"]:>8.1f}  '
+            f'p50 {result["p50_ms"]:>6.3f} ms  '
+            f'p99 {result["p99_ms"]:>6.3f} ms  '
+            f'запросов на запрос {result["queries"]:.2f}  '
+            f'попаданий {result["hit_ratio"]:.1%}'
+        )
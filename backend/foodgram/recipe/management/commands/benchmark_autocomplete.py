@@ -0,0 +1,77 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+from csv import reader
+
+from api.catalog import build_catalog
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from recipe.models import Ingredient
+from rest_framework.test import APIClient
+
+
+class Command(BaseCommand):
+    """Замеряет задержку автодополнения ингредиентов (p50/p99).
+
+    Каталог из recipe/data/ingredients.csv размножается в scale раз
+    внутри транзакции, которая откатывается по окончании замера.
+    Одни и те же запросы выполняются по базе и по снимку каталога
+    (api.catalog), собранному во временном каталоге.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with open('recipe/data/ingredients.csv', encoding='UTF-8') as file:
+            rows = [row for row in reader(file) if len(row) == 2]
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(
+                        name=f'{name} {copy}' if copy else name,
+                        measurement_unit=measurement_unit,
+                    )
+                    for copy in range(options['scale'])
+                    for name, measurement_unit in rows
+                ),
+                batch_size=5000,
+            )
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'ingredients.bin')
+                for source in ('database', 'snapshot'):
+                    if source == 'snapshot':
+                        build_catalog(path)
+                    with override_settings(INGREDIENT_CATALOG_PATH=path):
+                        self.report(
+                            source, len(rows) * options['scale'],
+                            self.run_requests(rows, options),
+                        )
+            transaction.set_rollback(True)
+
+    def report(self, source, count, timings):
+        timings.sort()
+        self.stdout.write(
+            f'{source}: rows: {count}, '
+            f'requests: {len(timings)}, '
+            f'p50: {statistics.median(timings):.2f} ms, '
+            f'p99: {timings[int(len(timings) * 0.99) - 1]:.2f} ms'
+        )
+
+    def run_requests(self, rows, options):
+        rng = random.Random(options['seed'])
+        client = APIClient()
+        timings = []
+        for _ in range(options['requests']):
+            name = rng.choice(rows)[0]
+            start = rng.randrange(len(name)) if rng.random() < 0.3 else 0
+            term = name[start:start + rng.randint(1, 4)]
+            started = time.perf_counter()
+            client.get('/api/ingredients/', {'name': term})
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
@@ -0,0 +1,74 @@
+import statistics
+import time
+
+import numpy as np
+from api.matching import IngredientIndex
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Замеряет подбор рецептов по ингредиентам на синтетическом каталоге.
+
+    Каталог генерируется в памяти, без базы: популярность ингредиентов
+    распределена по закону Ципфа, как в настоящих рецептах.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=300000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--per-recipe', type=int, nargs=2,
+                            default=(3, 15), metavar=('MIN', 'MAX'))
+        parser.add_argument('--pantry', type=int, default=20)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        ingredients, recipes = self.generate(rng, options)
+        started = time.perf_counter()
+        index = IngredientIndex.from_pairs(ingredients, recipes)
+        build = time.perf_counter() - started
+        self.stdout.write(
+            f'recipes: {options["recipes"]}, pairs: {len(index.keys)}, '
+            f'build: {build:.2f} s, memory: {index.nbytes / 2 ** 20:.1f} MiB'
+        )
+        timings = []
+        for _ in range(options['queries']):
+            pantry = self.draw(rng, options['ingredients'], options['pantry'])
+            started = time.perf_counter()
+            index.match(pantry)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f'match: p50 {statistics.median(timings):.2f} ms, '
+            f'p99 {timings[int(len(timings) * 0.99) - 1]:.2f} ms'
+        )
+        changed = rng.choice(options['recipes'], 10, replace=False) + 1
+        selected = np.isin(recipes, changed)
+        started = time.perf_counter()
+        index.replace(changed, ingredients[selected], recipes[selected])
+        self.stdout.write(
+            f'refresh of {len(changed)} recipes: '
+            f'{(time.perf_counter() - started) * 1000:.2f} ms'
+        )
+
+    def draw(self, rng, count, size):
+        """size различных ингредиентов с вероятностью по Ципфу."""
+        weights = 1 / np.arange(1, count + 1)
+        return rng.choice(
+            np.arange(1, count + 1), size, replace=False,
+            p=weights / weights.sum()
+        )
+
+    def generate(self, rng, options):
+        low, high = options['per_recipe']
+        sizes = rng.integers(low, high + 1, options['recipes'])
+        recipes = np.repeat(
+            np.arange(1, options['recipes'] + 1, dtype=np.int64), sizes
+        )
+        weights = 1 / np.arange(1, options['ingredients'] + 1)
+        ingredients = rng.choice(
+            np.arange(1, options['ingredients'] + 1, dtype=np.int64),
+            len(recipes), p=weights / weights.sum()
+        )
+        return ingredients, recipes
@@ -0,0 +1,257 @@
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from recipe.models import Ingredient, Recipe
+from rest_framework.authtoken.models import Token
+
+from .benchmark_api import percentile
+from .seed_data import PREFIX
+
+User = get_user_model()
+
+DEPLOYMENTS = {
+    'wsgi': ('foodgram.wsgi:application', ()),
+    'asgi': (
+        'foodgram.asgi:application',
+        ('--worker-class', 'uvicorn.workers.UvicornWorker'),
+    ),
+}
+READY_TIMEOUT = 30
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """gunicorn с развёртыванием name, ограниченный ядрами cpus."""
+
+    def __init__(self, name, workers, cpus):
+        application, options = DEPLOYMENTS[name]
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', application, *options,
+                '--workers', str(workers),
+                '--bind', f'127.0.0.1:{self.port}',
+                '--log-level', 'warning',
+            ],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                'INSTRUMENTATION_SAMPLE_RATE': '0',
+                'REQUEST_LOG_LEVEL': 'WARNING',
+            },
+            preexec_fn=lambda: os.sched_setaffinity(0, cpus),
+        )
+
+    def __enter__(self):
+        deadline = time.monotonic() + READY_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError('Сервер завершился при запуске.')
+            try:
+                connection = http.client.HTTPConnection(
+                    '127.0.0.1', self.port, timeout=5
+                )
+                connection.request('GET', '/api/tags/')
+                status = connection.getresponse().status
+                connection.close()
+                if status == 200:
+                    return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError('Сервер не ответил за отведённое время.')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def request_once(connection, path, headers):
+    """Время ответа в секундах или None, если запрос не удался."""
+    started = time.perf_counter()
+    try:
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+    except (OSError, http.client.HTTPException):
+        connection.close()
+        return None
+    if response.status != 200:
+        return None
+    return time.perf_counter() - started
+
+
+def load(port, requests, concurrency, duration):
+    """Нагрузка из concurrency соединений в течение duration секунд.
+
+    Соединения перебирают requests — пары (путь, заголовки) — по кругу.
+    Возвращает времена успешных ответов и число ошибок.
+    """
+    deadline = time.perf_counter() + duration
+    timings = []
+    errors = []
+
+    def worker(offset):
+        connection = http.client.HTTPConnection(
+            '127.0.0.1', port, timeout=30
+        )
+        local = []
+        position = offset
+        while time.perf_counter() < deadline:
+            path, headers = requests[position % len(requests)]
+            position += 1
+            local.append(request_once(connection, path, headers))
+        connection.close()
+        timings.extend(value for value in local if value is not None)
+        errors.append(local.count(None))
+
+    threads = [
+        threading.Thread(target=worker, args=(number, ))
+        for number in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, sum(errors)
+
+
+class Command(BaseCommand):
+    """Сравнивает синхронное (WSGI) и асинхронное (ASGI) развёртывания.
+
+    Оба запускаются через gunicorn с одинаковым числом воркеров на одних
+    и тех же ядрах (--cpus, по умолчанию половина доступных), нагрузка
+    подаётся с остальных ядер. Для каждого читающего сценария выводятся
+    пропускная способность и перцентили задержки. Нужны данные из
+    seed_data.
+    """
+    scenarios = (
+        'recipes',
+        'recipes_authenticated',
+        'recipe_detail',
+        'tags',
+        'ingredient_autocomplete',
+        'shopping_cart',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--cpus', type=lambda value: {
+            int(cpu) for cpu in value.split(',')
+        })
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--warmup', type=float, default=1)
+        parser.add_argument('--scenario', action='append',
+                            choices=self.scenarios)
+        parser.add_argument('--deployment', action='append',
+                            choices=tuple(DEPLOYMENTS))
+        parser.add_argument('--output')
+
+    def handle(self, *args, **options):
+        server_cpus, client_cpus = self.split_cpus(options['cpus'])
+        os.sched_setaffinity(0, client_cpus)
+        requests = self.requests()
+        names = options['scenario'] or self.scenarios
+        results = {}
+        for deployment in options['deployment'] or DEPLOYMENTS:
+            with Server(deployment, options['workers'], server_cpus) as server:
+                for name in names:
+                    results.setdefault(name, {})[deployment] = self.measure(
+                        server.port, requests[name], options
+                    )
+                    self.report(name, deployment, results[name][deployment])
+        if options['output']:
+            meta = {
+                'workers': options['workers'],
+                'server_cpus': sorted(server_cpus),
+                'client_cpus': sorted(client_cpus),
+                'concurrency': options['concurrency'],
+                'duration': options['duration'],
+            }
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({'meta': meta, 'scenarios': results}, file,
+                          ensure_ascii=False, indent=2)
+                file.write('\n')
+
+    def split_cpus(self, cpus):
+        available = sorted(os.sched_getaffinity(0))
+        if cpus is None:
+            cpus = set(available[:max(1, len(available) // 2)])
+        if not cpus <= set(available):
+            raise CommandError(f'Доступны только ядра {available}.')
+        return cpus, (set(available) - cpus) or cpus
+
+    def requests(self):
+        user = User.objects.filter(
+            username__startswith=PREFIX
+        ).order_by('pk').first()
+        if user is None:
+            raise CommandError('Нет данных, сначала выполните seed_data.')
+        token, _ = Token.objects.get_or_create(user=user)
+        auth = {'Authorization': f'Token {token.key}'}
+        recipes = Recipe.objects.order_by('-pk').values_list('pk', flat=True)
+        names = Ingredient.objects.values_list('name', flat=True)[:100]
+        return {
+            'recipes': [
+                (f'/api/recipes/?page={page}', {'X-Cache-Bypass': '1'})
+                for page in range(1, 6)
+            ],
+            'recipes_authenticated': [
+                (f'/api/recipes/?page={page}', auth) for page in range(1, 6)
+            ],
+            'recipe_detail': [
+                (f'/api/recipes/{pk}/', auth) for pk in recipes[:50]
+            ],
+            'tags': [('/api/tags/', {})],
+            'ingredient_autocomplete': [
+                (f'/api/ingredients/?name={quote(name[:3])}', {})
+                for name in names
+            ],
+            'shopping_cart': [('/api/recipes/download_shopping_cart/', auth)],
+        }
+
+    def measure(self, port, requests, options):
+        load(port, requests, options['concurrency'], options['warmup'])
+        timings, errors = load(
+            port, requests, options['concurrency'], options['duration']
+        )
+        timings = sorted(value * 1000 for value in timings)
+        if not timings:
+            raise CommandError('Ни один запрос не выполнен успешно.')
+        return {
+            'rps': round(len(timings) / options['duration'], 1),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'errors': errors,
+        }
+
+    def report(self, name, deployment, result):
+        self.stdout.write(
+            f'{name:<24} {deployment}  '
+            f'rps {result["rps"]:>8.1f}  '
+            f'p50 {result["p50_ms"]:>8.2f} ms  '
+            f'p95 {result["p95_ms"]:>8.2f} ms  '
+            f'p99 {result["p99_ms"]:>8.2f} ms  '
+            f'ошибок {result["errors"]}'
+        )
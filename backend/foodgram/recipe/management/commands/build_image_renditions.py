@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from recipe.images import build_renditions
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    """Создаёт недостающие варианты изображений для всех рецептов."""
+
+    def handle(self, *args, **kwargs):
+        names = Recipe.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+        built = 0
+        for name in names.iterator():
+            try:
+                build_renditions(name)
+            except OSError as error:
+                self.stderr.write(f'{name}: {error}')
+                continue
+            built += 1
+        self.stdout.write(f'Обработано изображений: {built}')
@@ -0,0 +1,30 @@
+import os
+import time
+
+from api.catalog import build_catalog
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Собирает снимок каталога ингредиентов для воркеров и клиентов.
+
+    Снимок и его сжатая копия записываются атомарно, воркеры подхватывают
+    новый файл на следующем запросе. После изменения ингредиентов через
+    модели снимок пересобирается сам; команду стоит запускать после
+    загрузки в обход моделей и при первом развёртывании.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=settings.INGREDIENT_CATALOG_PATH)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        started = time.perf_counter()
+        version, rows = build_catalog(path)
+        self.stdout.write(
+            f'Снимок {path}: версия {version}, ингредиентов {rows}, '
+            f'{os.path.getsize(path)} байт, сжатый '
+            f'{os.path.getsize(f"{path}.gz")} байт, '
+            f'{time.perf_counter() - started:.2f} с'
+        )
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipe.recommendations import build_recommended, build_similar
+
+
+class Command(BaseCommand):
+    """Пересчитывает похожие рецепты и рекомендации по избранному.
+
+    Без аргументов пересчитывает всё. С --recipes обновляются только
+    похожие для указанных рецептов, тех, у кого они были в списке, и
+    тех, в чей список они теперь входят; с --users — только
+    рекомендации указанных пользователей. Частичный пересчёт не
+    обновляет сходство остальных пар после изменения весов idf, поэтому
+    полный пересчёт по расписанию по-прежнему нужен.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, nargs='+')
+        parser.add_argument('--users', type=int, nargs='+')
+        parser.add_argument('--k', type=int, default=20)
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--max-df', type=float, default=0.5)
+
+    def handle(self, *args, **options):
+        partial = options['recipes'] or options['users']
+        if options['recipes'] or not partial:
+            started = time.perf_counter()
+            count = build_similar(
+                options['recipes'], options['k'],
+                options['chunk_size'], options['max_df'],
+            )
+            self.stdout.write(
+                f'Похожие: рецептов {count}, '
+                f'{time.perf_counter() - started:.1f} с'
+            )
+        if options['users'] or not partial:
+            started = time.perf_counter()
+            count = build_recommended(
+                options['users'], options['k'], options['chunk_size']
+            )
+            self.stdout.write(
+                f'Рекомендации: пользователей {count}, '
+                f'{time.perf_counter() - started:.1f} с'
+            )
@@ -0,0 +1,98 @@
+import json
+
+from api.utils import get_shopping_cart
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipe.models import (AmountIngredient, FavoriteRecipe, Recipe,
+                           ShoppingList)
+from user.models import Follow
+
+User = get_user_model()
+
+
+def hot_queries(user_id, recipe_id):
+    """Основные запросы API, которые должны обслуживаться индексами."""
+    user = User(pk=user_id)
+    return {
+        'рецепты автора': Recipe.objects.filter(
+            author_id=user_id
+        ).order_by('-pub_date', '-id')[:6],
+        'рецепты автора по тегу': Recipe.objects.filter(
+            author_id=user_id, tags__slug__in=['breakfast']
+        ).order_by('-pub_date', '-id')[:6],
+        'рецепты по популярности': Recipe.objects.order_by(
+            '-favorites_count', '-id'
+        )[:6],
+        'ингредиенты рецепта': AmountIngredient.objects.filter(
+            recipe_id=recipe_id
+        ),
+        'рецепты с ингредиентом': AmountIngredient.objects.filter(
+            ingredients_id=1
+        ).values('recipe_id'),
+        'список покупок': get_shopping_cart(user),
+        'рецепт в избранном': FavoriteRecipe.objects.filter(
+            user_id=user_id, recipe_id=recipe_id
+        ).values('pk')[:1],
+        'рецепт в списке покупок': ShoppingList.objects.filter(
+            user_id=user_id, recipe_id=recipe_id
+        ).values('pk')[:1],
+        'подписки': Follow.objects.filter(
+            user_id=user_id
+        ).order_by('-id')[:6],
+    }
+
+
+def _postgresql_scans(plan):
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan['Relation Name']
+    for child in plan.get('Plans', ()):
+        yield from _postgresql_scans(child)
+
+
+def full_scans(cursor, sql, params):
+    """Таблицы, которые запрос читает целиком."""
+    if connection.vendor == 'postgresql':
+        # Без seq scan планировщик берёт любой подходящий индекс, так что
+        # оставшийся Seq Scan означает, что индекса нет вовсе.
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return list(_postgresql_scans(plan[0]['Plan']))
+    if connection.vendor == 'sqlite':
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [
+            detail.split()[1] for *_, detail in cursor.fetchall()
+            if detail.startswith('SCAN ') and ' USING ' not in detail
+        ]
+    raise CommandError(f'EXPLAIN для {connection.vendor} не поддерживается.')
+
+
+class Command(BaseCommand):
+    """Проверяет планы основных запросов: полный просмотр таблиц — ошибка.
+
+    Запускается на базе с данными (например, после seed_data).
+    """
+
+    def handle(self, *args, **options):
+        user_id = User.objects.values_list('pk', flat=True).first() or 1
+        recipe_id = Recipe.objects.values_list('pk', flat=True).first() or 1
+        failed = []
+        with transaction.atomic(), connection.cursor() as cursor:
+            for name, queryset in hot_queries(user_id, recipe_id).items():
+                sql, params = queryset.query.sql_with_params()
+                scans = full_scans(cursor, sql, params)
+                if scans:
+                    failed.append(name)
+                    self.stdout.write(
+                        f'{name}: полный просмотр {", ".join(scans)}'
+                    )
+                else:
+                    self.stdout.write(f'{name}: ok')
+            transaction.set_rollback(True)
+        if failed:
+            raise CommandError(
+                f'Запросы без подходящего индекса: {", ".join(failed)}'
+            )
@@ -0,0 +1,19 @@
+from api.bulk import export_recipes
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Выгружает все рецепты в формате JSON Lines."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Файл; по умолчанию stdout.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        lines = export_recipes(chunk_size=options['chunk_size'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='UTF-8') as file:
+            file.writelines(lines)
@@ -0,0 +1,33 @@
+from api.bulk import RecipeImporter
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Импортирует рецепты из файла JSON Lines."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--author',
+            help='Автор для строк без поля author (username).'
+        )
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        author = None
+        if options['author']:
+            author = User.objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError(f'Нет пользователя {options["author"]}')
+        importer = RecipeImporter(author, options['chunk_size'])
+        with open(options['path'], encoding='UTF-8') as file:
+            report = importer.run(file)
+        for error in report['errors']:
+            self.stderr.write(f'Строка {error["line"]}: {error["error"]}')
+        self.stdout.write(
+            f'Добавлено: {report["created"]}, '
+            f'ошибок: {len(report["errors"])}'
+        )
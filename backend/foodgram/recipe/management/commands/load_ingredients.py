@@ -1,19 +1,209 @@
-from csv import reader
+import io
+import json
+import os
+import time
+from csv import reader, writer
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from api.cache import INGREDIENTS, bump_version
+from api.catalog import build_catalog
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 from recipe.models import Ingredient
 
+STAGING_TABLE = 'recipe_ingredient_staging'
+NAME_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+
+
+def read_csv(file):
+    """Строки (name, measurement_unit); None для строки не из двух полей."""
+    for row in reader(file):
+        if len(row) == 2:
+            yield row[0], row[1]
+        elif row:
+            yield None
+
+
+def json_row(item):
+    """(name, measurement_unit) объекта или None, если полей нет."""
+    if not isinstance(item, dict):
+        return None
+    name, measurement_unit = item.get('name'), item.get('measurement_unit')
+    if not isinstance(name, str) or not isinstance(measurement_unit, str):
+        return None
+    return name, measurement_unit
+
+
+class JsonStream:
+    """Файл с JSON, читаемый по частям."""
+
+    def __init__(self, file, buffer_size):
+        self.file = file
+        self.buffer_size = buffer_size
+        self.buffer = ''
+        self.position = 0
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        chunk = self.file.read(self.buffer_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        """Следующий непробельный символ или '' в конце файла."""
+        while True:
+            while (self.position < len(self.buffer)
+                   and self.buffer[self.position].isspace()):
+                self.position += 1
+            if self.position < len(self.buffer) or not self.fill():
+                return self.buffer[self.position:self.position + 1]
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise CommandError('Ожидается JSON-массив ингредиентов.')
+        self.position += 1
+        return char
+
+    def decode(self):
+        """Очередное значение; значение у края буфера дочитывается."""
+        self.peek()
+        while True:
+            try:
+                item, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError as error:
+                if not self.fill():
+                    raise CommandError(f'Некорректный JSON: {error}.')
+                continue
+            if end < len(self.buffer) or not self.fill():
+                self.position = end
+                return item
+
+
+def read_json(file, buffer_size=1 << 16):
+    """Потоково читает JSON-массив объектов, не загружая файл целиком.
+
+    Элемент без строковых name и measurement_unit отдаётся как None.
+    """
+    stream = JsonStream(file, buffer_size)
+    stream.expect('[')
+    if stream.peek() == ']':
+        stream.expect(']')
+    else:
+        while True:
+            yield json_row(stream.decode())
+            if stream.expect(',]') == ']':
+                break
+    if stream.peek():
+        raise CommandError('Лишние данные после JSON-массива ингредиентов.')
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def fits(row):
+    """Строка прочитана и её поля помещаются в колонки Ingredient."""
+    return (
+        row is not None
+        and len(row[0]) <= NAME_LENGTH and len(row[1]) <= UNIT_LENGTH
+    )
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
 
 class Command(BaseCommand):
-    """Добавляем ингредиенты из файла CSV."""
-
-    def handle(self, *args, **kwargs):
-        with open(
-                'recipe/data/ingredients.csv',
-                encoding='UTF-8'
-        ) as ingredients:
-            for row in reader(ingredients):
-                if len(row) == 2:
-                    Ingredient.objects.get_or_create(
-                        name=row[0], measurement_unit=row[1],
-                    )
+    """Добавляем ингредиенты из файла CSV или JSON.
+
+    Повторный запуск безопасен: уже существующие пары
+    (name, measurement_unit) пропускаются за счёт уникального ограничения.
+    Строки с полями длиннее колонок считаются некорректными, как и
+    строки не из двух полей.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default='recipe/data/ingredients.csv'
+        )
+        parser.add_argument('--format', choices=READERS, default=None)
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (
+            options['format'] or os.path.splitext(path)[1].lstrip('.')
+        )
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if connection.vendor == 'postgresql':
+            load_chunk = self.copy_chunk
+        else:
+            load_chunk = self.bulk_create_chunk
+        started = time.perf_counter()
+        total = Ingredient.objects.count()
+        read = invalid = 0
+        with open(path, encoding='UTF-8') as file, transaction.atomic():
+            if connection.vendor == 'postgresql':
+                self.create_staging_table()
+            rows = READERS[file_format](file)
+            for chunk in chunked(rows, options['chunk_size']):
+                valid = [row for row in chunk if fits(row)]
+                invalid += len(chunk) - len(valid)
+                read += len(valid)
+                load_chunk(list(dict.fromkeys(valid)))
+        inserted = Ingredient.objects.count() - total
+        if inserted:
+            bump_version(INGREDIENTS)
+            build_catalog()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Прочитано: {read}, добавлено: {inserted}, '
+            f'пропущено: {read - inserted}, некорректных: {invalid}, '
+            f'{read / elapsed if elapsed else read:.0f} строк/с'
+        )
+
+    def create_staging_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE {STAGING_TABLE} '
+                f'(name varchar({NAME_LENGTH}), '
+                f'measurement_unit varchar({UNIT_LENGTH})) ON COMMIT DROP'
+            )
+
+    def copy_chunk(self, chunk):
+        buffer = io.StringIO()
+        writer(buffer).writerows(chunk)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} FROM STDIN WITH (FORMAT csv)', buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {Ingredient._meta.db_table} '
+                '(name, measurement_unit) '
+                f'SELECT name, measurement_unit FROM {STAGING_TABLE} '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            cursor.execute(f'TRUNCATE {STAGING_TABLE}')
+
+    def bulk_create_chunk(self, chunk):
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in chunk
+            ),
+            ignore_conflicts=True,
+        )
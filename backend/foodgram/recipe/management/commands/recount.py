@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipe.models import FavoriteRecipe, Recipe, ShoppingList
+from user.models import Follow, UserStats
+
+User = get_user_model()
+
+
+def count_related(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingList, 'recipe'),
+    (UserStats, 'recipes_count', Recipe, 'author'),
+    (UserStats, 'followers_count', Follow, 'author'),
+)
+
+
+class Command(BaseCommand):
+    """Пересчитывает денормализованные счётчики одним UPDATE на счётчик.
+
+    С флагом --check только сверяет значения и завершается с ошибкой,
+    если найдены расхождения.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            return self.check_counters()
+        with transaction.atomic():
+            UserStats.objects.bulk_create(
+                (
+                    UserStats(user_id=pk)
+                    for pk in User.objects.filter(
+                        stats__isnull=True
+                    ).values_list('pk', flat=True).iterator()
+                ),
+                ignore_conflicts=True,
+            )
+            for model, field, related_model, related_field in COUNTERS:
+                updated = model.objects.update(
+                    **{field: count_related(related_model, related_field)}
+                )
+                self.stdout.write(
+                    f'{model.__name__}.{field}: пересчитано {updated}'
+                )
+
+    def check_counters(self):
+        mismatched = 0
+        for model, field, related_model, related_field in COUNTERS:
+            count = model.objects.annotate(
+                actual=count_related(related_model, related_field)
+            ).exclude(**{field: F('actual')}).count()
+            self.stdout.write(f'{model.__name__}.{field}: расхождений {count}')
+            mismatched += count
+        missing = User.objects.filter(stats__isnull=True).count()
+        self.stdout.write(f'Пользователей без счётчиков: {missing}')
+        if mismatched or missing:
+            raise CommandError('Счётчики не совпадают, запустите recount.')
@@ -0,0 +1,200 @@
+import random
+from io import BytesIO
+
+from api.cache import INGREDIENTS, RECIPES, TAGS, bump_version
+from api.matching import COOK
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+from recipe.images import save_original
+from recipe.models import (AmountIngredient, FavoriteRecipe, Ingredient,
+                           Recipe, ShoppingList, Tag)
+from recipe.search import update_search_index
+from user.models import Follow
+
+User = get_user_model()
+
+PREFIX = 'seed_'
+PASSWORD = 'seed-password'
+WORDS = (
+    'свежий', 'домашний', 'пряный', 'сливочный', 'запечённый', 'лёгкий',
+    'суп', 'салат', 'пирог', 'рагу', 'паста', 'каша', 'омлет', 'соус',
+)
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    """Заполняет базу синтетическими данными для нагрузочных замеров.
+
+    Пользователи получают имена seed_<n> и пароль seed-password, теги —
+    slug seed-<n>. С --clear ранее созданные данные удаляются. При одном
+    и том же --seed генерируются одинаковые данные.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--per-recipe', type=int, nargs=2,
+                            default=(3, 12), metavar=('MIN', 'MAX'))
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--cart', type=int, default=5)
+        parser.add_argument('--follows', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clear', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.clear()
+        elif User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError('Данные уже созданы, используйте --clear.')
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            tags = self.create_tags(rng, options['tags'])
+            ingredients = self.create_ingredients(options['ingredients'])
+            recipes = self.create_recipes(rng, users, options['recipes'])
+            self.link_tags(rng, recipes, tags)
+            self.link_ingredients(
+                rng, recipes, ingredients, options['per_recipe']
+            )
+            self.link_users(rng, users, recipes, options)
+        call_command('recount', stdout=self.stdout)
+        update_search_index()
+        for name in (RECIPES, TAGS, INGREDIENTS, COOK):
+            bump_version(name)
+        self.stdout.write(
+            f'Создано: пользователей {len(users)}, рецептов {len(recipes)}, '
+            f'тегов {len(tags)}, ингредиентов в каталоге {len(ingredients)}'
+        )
+
+    def clear(self):
+        with transaction.atomic():
+            User.objects.filter(username__startswith=PREFIX).delete()
+            Tag.objects.filter(slug__startswith='seed-').delete()
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        return User.objects.bulk_create(
+            (
+                User(
+                    username=f'{PREFIX}{number}',
+                    email=f'{PREFIX}{number}@example.com',
+                    first_name='Seed',
+                    last_name=str(number),
+                    password=password,
+                )
+                for number in range(count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+    def create_tags(self, rng, count):
+        return Tag.objects.bulk_create(
+            Tag(
+                name=f'Seed tag {number}',
+                slug=f'seed-{number}',
+                color=f'#{rng.randrange(1 << 24):06X}',
+            )
+            for number in range(count)
+        )
+
+    def create_ingredients(self, count):
+        """id ингредиентов каталога, недостающие создаются."""
+        missing = count - Ingredient.objects.count()
+        if missing > 0:
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(
+                        name=f'seed ингредиент {number}',
+                        measurement_unit='г',
+                    )
+                    for number in range(missing)
+                ),
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        return list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )[:count]
+
+    def create_recipes(self, rng, users, count):
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), '#E0A060').save(buffer, 'JPEG')
+        image = save_original(ContentFile(buffer.getvalue(), name='seed'))
+        start = Recipe.objects.count()
+        return Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author=rng.choice(users),
+                    name=f'Seed {start + number} '
+                    + ' '.join(rng.sample(WORDS, 2)),
+                    text=' '.join(rng.choices(WORDS, k=30)),
+                    cooking_time=rng.randint(5, 180),
+                    image=image,
+                )
+                for number in range(count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+    def link_tags(self, rng, recipes, tags):
+        through = Recipe.tags.through
+        through.objects.bulk_create(
+            (
+                through(recipe_id=recipe.pk, tag_id=tag.pk)
+                for recipe in recipes
+                for tag in rng.sample(tags, min(len(tags), rng.randint(1, 3)))
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+    def link_ingredients(self, rng, recipes, ingredients, per_recipe):
+        low, high = per_recipe
+        AmountIngredient.objects.bulk_create(
+            (
+                AmountIngredient(
+                    recipe_id=recipe.pk,
+                    ingredients_id=pk,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe in recipes
+                for pk in rng.sample(
+                    ingredients, min(len(ingredients), rng.randint(low, high))
+                )
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+    def link_users(self, rng, users, recipes, options):
+        for model, count in (
+            (FavoriteRecipe, options['favorites']),
+            (ShoppingList, options['cart']),
+        ):
+            model.objects.bulk_create(
+                (
+                    model(user_id=user.pk, recipe_id=recipe.pk)
+                    for user in users
+                    for recipe in rng.sample(
+                        recipes, min(len(recipes), count)
+                    )
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user.pk, author_id=author.pk)
+                for user in users
+                for author in rng.sample(
+                    users, min(len(users), options['follows'] + 1)
+                )
+                if author != user
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,62 @@
+# Generated by Django 4.1.3 on 2026-10-18 02:25
+
+from django.db import migrations, models
+
+# Предел PositiveSmallIntegerField AmountIngredient.amount.
+MAX_AMOUNT = 32767
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipe', 'Ingredient')
+    AmountIngredient = apps.get_model('recipe', 'AmountIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1)
+    for duplicate in duplicates:
+        extra = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(id=duplicate['keep_id'])
+        AmountIngredient.objects.filter(ingredients__in=extra).update(
+            ingredients_id=duplicate['keep_id']
+        )
+        extra.delete()
+    sum_duplicate_amounts(AmountIngredient)
+
+
+def sum_duplicate_amounts(AmountIngredient):
+    """Сливает строки одного ингредиента в рецепте, складывая количество."""
+    duplicates = AmountIngredient.objects.order_by().values(
+        'recipe', 'ingredients'
+    ).annotate(
+        keep_id=models.Min('id'), total=models.Sum('amount'),
+        count=models.Count('id'),
+    ).filter(count__gt=1)
+    for duplicate in list(duplicates):
+        rows = AmountIngredient.objects.filter(
+            recipe_id=duplicate['recipe'],
+            ingredients_id=duplicate['ingredients'],
+        )
+        rows.filter(id=duplicate['keep_id']).update(
+            amount=min(duplicate['total'], MAX_AMOUNT)
+        )
+        rows.exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0003_ingredient_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_measurement_unit'),
+        ),
+    ]
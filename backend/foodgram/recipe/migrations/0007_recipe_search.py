@@ -0,0 +1,67 @@
+# Generated by Django 4.1.3 on 2026-10-18 02:33
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# SQL перенесён из recipe.search на момент миграции: код приложения может
+# меняться, а миграция должна выполняться так же, как при создании.
+FTS_TABLE = 'recipe_recipe_fts'
+INGREDIENT_NAMES = (
+    'SELECT {aggregate} FROM recipe_amountingredient AS a '
+    'JOIN recipe_ingredient AS i ON i.id = a.ingredients_id '
+    'WHERE a.recipe_id = r.id'
+)
+POSTGRES_UPDATE = (
+    'UPDATE recipe_recipe AS r SET search_vector = '
+    "setweight(to_tsvector('russian', coalesce(r.name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(("
+    + INGREDIENT_NAMES.format(aggregate="string_agg(i.name, ' ')")
+    + "), '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(r.text, '')), 'C')"
+)
+SQLITE_INSERT = (
+    f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+    'SELECT r.id, r.name, coalesce(('
+    + INGREDIENT_NAMES.format(aggregate="group_concat(i.name, ' ')")
+    + "), ''), r.text FROM recipe_recipe AS r"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX recipe_search_vector_idx '
+            'ON recipe_recipe USING gin (search_vector)'
+        )
+        schema_editor.execute(POSTGRES_UPDATE)
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} '
+            'USING fts5(name, ingredients, text)'
+        )
+        schema_editor.execute(SQLITE_INSERT)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX recipe_search_vector_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0006_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
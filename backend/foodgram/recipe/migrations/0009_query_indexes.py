@@ -0,0 +1,70 @@
+# Generated by Django 4.1.3 on 2026-10-18 02:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Предел PositiveSmallIntegerField AmountIngredient.amount.
+MAX_AMOUNT = 32767
+
+
+def merge_duplicate_amounts(apps, schema_editor):
+    sum_duplicate_amounts(apps.get_model('recipe', 'AmountIngredient'))
+
+
+def sum_duplicate_amounts(AmountIngredient):
+    """Сливает строки одного ингредиента в рецепте, складывая количество."""
+    duplicates = AmountIngredient.objects.order_by().values(
+        'recipe', 'ingredients'
+    ).annotate(
+        keep_id=models.Min('id'), total=models.Sum('amount'),
+        count=models.Count('id'),
+    ).filter(count__gt=1)
+    for duplicate in list(duplicates):
+        rows = AmountIngredient.objects.filter(
+            recipe_id=duplicate['recipe'],
+            ingredients_id=duplicate['ingredients'],
+        )
+        rows.filter(id=duplicate['keep_id']).update(
+            amount=min(duplicate['total'], MAX_AMOUNT)
+        )
+        rows.exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0008_recommendations'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_amounts, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='amountingredient',
+            index=models.Index(fields=['ingredients', 'recipe'], name='amount_ingredient_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='amountingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredients'), name='unique_recipe_ingredient'),
+        ),
+        migrations.AlterField(
+            model_name='amountingredient',
+            name='ingredients',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipe_am', to='recipe.ingredient', verbose_name='Ингредиенты'),
+        ),
+        migrations.AlterField(
+            model_name='amountingredient',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipe', to='recipe.recipe', verbose_name='Рецепт'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0009_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchEntry',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='recipe.recipe')),
+            ],
+            options={
+                'db_table': 'recipe_recipe_fts',
+                'managed': False,
+            },
+        ),
+    ]
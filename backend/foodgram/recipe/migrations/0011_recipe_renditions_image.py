@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0010_recipe_search_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='renditions_image',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Изображение с готовыми вариантами'),
+        ),
+    ]
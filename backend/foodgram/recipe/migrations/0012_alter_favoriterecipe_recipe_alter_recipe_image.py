@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0011_recipe_renditions_image'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='favoriterecipe',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorite_in', to='recipe.recipe', verbose_name='Понравившийся рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(help_text='Загрузите фотографию', upload_to='recipe/image', verbose_name='Фотография готового блюда'),
+        ),
+    ]
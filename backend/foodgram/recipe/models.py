@@ -1,7 +1,9 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch
 from django.template.defaultfilters import slugify
 from django.urls import reverse
 
@@ -53,6 +55,14 @@ class Ingredient(models.Model):
         verbose_name='Единица измерения'
     )
 
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_measurement_unit',
+            ),
+        )
+
     def __str__(self):
         return self.name
 
@@ -66,12 +76,14 @@ class AmountIngredient(models.Model):
         related_name='recipe',
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     ingredients = models.ForeignKey(
         'Ingredient',
         related_name='recipe_am',
         verbose_name='Ингредиенты',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     amount = models.PositiveSmallIntegerField(
         verbose_name='Количество',
@@ -85,11 +97,57 @@ class AmountIngredient(models.Model):
 
     class Meta:
         ordering = ['recipe']
+        constraints = (
+            # Индекс ограничения обслуживает и выборку по recipe.
+            models.UniqueConstraint(
+                fields=('recipe', 'ingredients'),
+                name='unique_recipe_ingredient',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('ingredients', 'recipe'),
+                name='amount_ingredient_recipe_idx',
+            ),
+        )
 
     def __str__(self):
         return f'{self.amount} {self.ingredients}'
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Запросы к рецептам для выдачи списком."""
+
+    def with_related(self):
+        """Подгружает авторов, теги и ингредиенты пачкой на всю страницу."""
+        return self.select_related('author').prefetch_related(
+            # Представления тегов берутся из api.tags, нужны только id.
+            Prefetch('tags', queryset=Tag.objects.only('id')),
+            Prefetch(
+                'recipe',
+                queryset=AmountIngredient.objects.select_related(
+                    'ingredients'
+                ),
+            ),
+        )
+
+    def with_user_flags(self, user):
+        """Добавляет признаки избранного и списка покупок для user."""
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=models.Value(False),
+                is_in_shopping_cart=models.Value(False),
+            )
+        return self.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        )
+
+
 class Recipe(models.Model):
     """Модель для описания рецепта."""
     author = models.ForeignKey(
@@ -108,6 +166,12 @@ class Recipe(models.Model):
         upload_to='recipe/image',
         help_text='Загрузите фотографию'
     )
+    renditions_image = models.CharField(
+        max_length=100,
+        blank=True,
+        editable=False,
+        verbose_name='Изображение с готовыми вариантами',
+    )
     text = models.TextField(
         verbose_name='Описание рецепта',
         help_text='Описание рецепта',
@@ -135,9 +199,35 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок',
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_favorites_count_idx',
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -193,3 +283,80 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'Рецепт {self.recipe} в списке покупок у {self.user}'
+
+
+class SimilarRecipe(models.Model):
+    """Похожие рецепты, рассчитанные командой build_recommendations."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_for',
+    )
+    score = models.FloatField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'), name='similar_recipe_score_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.similar} похож на {self.recipe}'
+
+
+class RecommendedRecipe(models.Model):
+    """Рекомендации по избранному, рассчитанные build_recommendations."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommended',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='recommended_to',
+    )
+    score = models.FloatField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_recommended_recipe',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-score'), name='recommended_user_score_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'Рецепт {self.recipe} рекомендован {self.user}'
+
+
+class RecipeSearchEntry(models.Model):
+    """Строка FTS5-таблицы поиска рецептов (только SQLite)."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_entry',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'recipe_recipe_fts'
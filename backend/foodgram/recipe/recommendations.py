@@ -0,0 +1,194 @@
+"""Расчёт похожих рецептов и рекомендаций по избранному.
+
+Рецепты описываются разреженной матрицей рецепт x ингредиент с весами
+idf, пользователи — матрицей пользователь x избранное. Ближайшие соседи
+ищутся косинусным сходством по блокам строк: память ограничена размером
+блока, а не размером каталога. Результаты пишутся в SimilarRecipe и
+RecommendedRecipe, откуда API читает их одним запросом по индексу.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min
+from scipy import sparse
+
+from .models import (AmountIngredient, FavoriteRecipe, RecommendedRecipe,
+                     SimilarRecipe)
+
+
+def _binary_matrix(queryset, fields):
+    """Разреженная матрица из пар id: строки — первое поле, столбцы — второе.
+
+    Строки и столбцы нумеруются самими id, поэтому матрицы разных
+    таблиц можно перемножать без перекодирования.
+    """
+    pairs = np.array(
+        list(queryset.order_by().values_list(*fields).iterator(
+            chunk_size=10000
+        )),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    if not len(pairs):
+        return sparse.csr_matrix((0, 0), dtype=np.float32)
+    matrix = sparse.csr_matrix((
+        np.ones(len(pairs), dtype=np.float32), (pairs[:, 0], pairs[:, 1])
+    ))
+    matrix.data[:] = 1
+    return matrix
+
+
+def recipe_vectors(max_df=0.5):
+    """Нормированные векторы рецептов по ингредиентам с весами idf.
+
+    Ингредиенты, которые встречаются больше чем в max_df доле рецептов
+    (соль, вода), не учитываются: они не отличают рецепты друг от друга.
+    """
+    matrix = _binary_matrix(AmountIngredient.objects, (
+        'recipe_id', 'ingredients_id'
+    ))
+    recipes = max(np.count_nonzero(matrix.getnnz(axis=1)), 1)
+    frequency = matrix.getnnz(axis=0)
+    idf = np.log((1 + recipes) / (1 + frequency)) + 1
+    idf[frequency > max_df * recipes] = 0
+    matrix = matrix @ sparse.diags(idf.astype(np.float32))
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+def _top_rows(scores, row_ids, k, exclude=None):
+    """Лучшие k столбцов каждой строки scores как (строка, столбец, вес)."""
+    for position, row_id in enumerate(row_ids):
+        start, end = scores.indptr[position], scores.indptr[position + 1]
+        columns = scores.indices[start:end]
+        values = scores.data[start:end]
+        if exclude is not None:
+            selected = ~np.isin(columns, exclude(row_id))
+            columns, values = columns[selected], values[selected]
+        selected = values > 0
+        columns, values = columns[selected], values[selected]
+        if len(values) > k:
+            best = np.argpartition(-values, k)[:k]
+            columns, values = columns[best], values[best]
+        for column, value in zip(columns.tolist(), values.tolist()):
+            yield row_id, column, value
+
+
+def _replace_rows(model, field, row_ids, rows):
+    with transaction.atomic():
+        model.objects.filter(**{f'{field}__in': row_ids}).delete()
+        model.objects.bulk_create(rows, batch_size=5000)
+
+
+def _gaining_neighbours(vectors, transposed, changed, k, chunk_size):
+    """Рецепты, в k похожих которых теперь должен войти один из changed.
+
+    Сходство симметрично, поэтому строки changed дают сходство каждого
+    рецепта с изменёнными. Рецепт попадает в ответ, если это сходство
+    выше худшего из его сохранённых похожих или их меньше k.
+    """
+    best = np.zeros(vectors.shape[0], dtype=np.float32)
+    for start in range(0, len(changed), chunk_size):
+        chunk = changed[start:start + chunk_size]
+        scores = (vectors[chunk] @ transposed).tocoo()
+        selected = scores.col != chunk[scores.row]
+        np.maximum.at(best, scores.col[selected], scores.data[selected])
+    candidates = np.flatnonzero(best)
+    stored = {
+        row['recipe_id']: row
+        for row in SimilarRecipe.objects.filter(
+            recipe_id__in=candidates.tolist()
+        ).values('recipe_id').annotate(count=Count('id'), low=Min('score'))
+    }
+    return {
+        recipe_id for recipe_id in candidates.tolist()
+        if recipe_id not in stored
+        or stored[recipe_id]['count'] < k
+        or best[recipe_id] > stored[recipe_id]['low']
+    }
+
+
+def build_similar(recipe_ids=None, k=20, chunk_size=500, max_df=0.5):
+    """Пересчитывает похожие рецепты для recipe_ids (или для всех).
+
+    При частичном пересчёте обновляются также рецепты, у которых
+    изменённые рецепты были в списке похожих, и рецепты, в список
+    которых они теперь входят. Веса idf при этом меняются для всего
+    каталога, а сходство остальных пар не пересчитывается, поэтому
+    полный пересчёт по расписанию остаётся точным результатом.
+    Возвращает число пересчитанных рецептов.
+    """
+    vectors = recipe_vectors(max_df)
+    transposed = vectors.T.tocsr()
+    if recipe_ids is None:
+        rows = np.flatnonzero(vectors.getnnz(axis=1))
+    else:
+        changed = np.array(sorted(set(recipe_ids)), dtype=np.int64)
+        changed = changed[changed < vectors.shape[0]]
+        affected = set(recipe_ids) | set(SimilarRecipe.objects.filter(
+            similar_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True)) | _gaining_neighbours(
+            vectors, transposed, changed, k, chunk_size
+        )
+        rows = np.array(sorted(affected), dtype=np.int64)
+        rows = rows[rows < vectors.shape[0]]
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        scores = (vectors[chunk] @ transposed).tocsr()
+        _replace_rows(SimilarRecipe, 'recipe_id', chunk.tolist(), [
+            SimilarRecipe(recipe_id=row, similar_id=column, score=value)
+            for row, column, value in _top_rows(
+                scores, chunk.tolist(), k, exclude=lambda row: row
+            )
+        ])
+    if recipe_ids is None:
+        SimilarRecipe.objects.exclude(
+            recipe_id__in=AmountIngredient.objects.values('recipe_id')
+        ).delete()
+    return len(rows)
+
+
+def build_recommended(user_ids=None, k=20, chunk_size=500):
+    """Пересчитывает рекомендации для user_ids (или для всех).
+
+    Оценка рецепта для пользователя — сумма его сходства с рецептами
+    из избранного; рецепты, которые уже в избранном, не предлагаются.
+    Сходство берётся из SimilarRecipe, поэтому сначала нужен
+    build_similar. Возвращает число пользователей.
+    """
+    favorites = FavoriteRecipe.objects.all()
+    if user_ids is not None:
+        favorites = favorites.filter(user_id__in=user_ids)
+    liked = _binary_matrix(favorites, ('user_id', 'recipe_id'))
+    similar = SimilarRecipe.objects.values_list(
+        'recipe_id', 'similar_id', 'score'
+    ).order_by()
+    triples = np.array(list(similar.iterator(chunk_size=10000))).reshape(
+        -1, 3
+    )
+    pairs = triples[:, :2].astype(np.int64)
+    size = max(liked.shape[1], int(pairs.max()) + 1 if len(pairs) else 0)
+    similarity = sparse.csr_matrix(
+        (triples[:, 2], (pairs[:, 0], pairs[:, 1])), shape=(size, size)
+    )
+    liked.resize(liked.shape[0], size)
+    rows = np.flatnonzero(liked.getnnz(axis=1))
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        block = liked[chunk]
+        scores = (block @ similarity).tocsr()
+        _replace_rows(RecommendedRecipe, 'user_id', chunk.tolist(), [
+            RecommendedRecipe(user_id=row, recipe_id=column, score=value)
+            for row, column, value in _top_rows(
+                scores, chunk.tolist(), k,
+                exclude=lambda row: liked.indices[
+                    liked.indptr[row]:liked.indptr[row + 1]
+                ]
+            )
+        ])
+    stale = RecommendedRecipe.objects.exclude(
+        user_id__in=FavoriteRecipe.objects.values('user_id')
+    )
+    if user_ids is not None:
+        stale = stale.filter(user_id__in=user_ids)
+    stale.delete()
+    return len(rows)
@@ -0,0 +1,101 @@
+"""Полнотекстовый поиск рецептов по названию, описанию и ингредиентам.
+
+На PostgreSQL поиск идёт по колонке Recipe.search_vector с GIN-индексом,
+на SQLite — по виртуальной таблице FTS5. Индекс обновляется через
+update_search_index, которую вызывают сигналы и массовые операции.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import BooleanField, F
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipe_recipe_fts'
+# Веса колонок name, ingredients, text для bm25 — как A, B, C в PostgreSQL.
+SQLITE_WEIGHTS = '10.0, 4.0, 1.0'
+
+INGREDIENT_NAMES = (
+    'SELECT {aggregate} FROM recipe_amountingredient AS a '
+    'JOIN recipe_ingredient AS i ON i.id = a.ingredients_id '
+    'WHERE a.recipe_id = r.id'
+)
+POSTGRES_UPDATE = (
+    'UPDATE recipe_recipe AS r SET search_vector = '
+    "setweight(to_tsvector(%s, coalesce(r.name, '')), 'A') || "
+    'setweight(to_tsvector(%s, coalesce(('
+    + INGREDIENT_NAMES.format(aggregate="string_agg(i.name, ' ')")
+    + "), '')), 'B') || "
+    "setweight(to_tsvector(%s, coalesce(r.text, '')), 'C')"
+)
+SQLITE_INSERT = (
+    f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+    'SELECT r.id, r.name, coalesce(('
+    + INGREDIENT_NAMES.format(aggregate="group_concat(i.name, ' ')")
+    + "), ''), r.text FROM recipe_recipe AS r"
+)
+
+
+def _update_postgresql(cursor, ids):
+    params = [SEARCH_CONFIG] * 3
+    if ids is None:
+        cursor.execute(POSTGRES_UPDATE, params)
+    else:
+        cursor.execute(POSTGRES_UPDATE + ' WHERE r.id = ANY(%s)', [
+            *params, ids
+        ])
+
+
+def _update_sqlite(cursor, ids):
+    if ids is None:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(SQLITE_INSERT)
+        return
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(
+        f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', ids
+    )
+    cursor.execute(SQLITE_INSERT + f' WHERE r.id IN ({placeholders})', ids)
+
+
+def update_search_index(ids=None):
+    """Пересчитывает поисковый индекс рецептов ids (или всех)."""
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            _update_postgresql(cursor, ids)
+        elif connection.vendor == 'sqlite':
+            _update_sqlite(cursor, ids)
+
+
+def fts_query(term):
+    """Запрос FTS5 из слов term: все слова, каждое как префикс."""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', term))
+
+
+def search_recipes(queryset, term):
+    """Рецепты queryset, подходящие под term, по убыванию релевантности."""
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            term, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date', '-id')
+    if connection.vendor == 'sqlite':
+        query = fts_query(term)
+        if not query:
+            return queryset.none()
+        # Соединение с FTS5-таблицей через RecipeSearchEntry вместо
+        # подзапросов: MATCH и bm25() вычисляются один раз на запрос, а не
+        # для каждой строки.
+        return queryset.filter(search_entry__isnull=False).filter(RawSQL(
+            f'{FTS_TABLE} MATCH %s', [query], output_field=BooleanField()
+        )).annotate(rank=RawSQL(
+            f'-bm25({FTS_TABLE}, {SQLITE_WEIGHTS})', []
+        )).order_by('-rank', '-pub_date', '-id')
+    return queryset.filter(name__icontains=term)
@@ -1,9 +1,15 @@
 from django.contrib import admin
 
-from .models import Follow
+from .models import Follow, UserStats
 
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'author')
     search_fields = ('user', 'author')
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'recipes_count', 'followers_count')
+    search_fields = ('user__username', )
@@ -0,0 +1,62 @@
+# Generated by Django 4.1.3 on 2026-10-18 02:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+
+def count_related(model, field):
+    return Coalesce(models.Subquery(
+        model.objects.filter(
+            **{field: models.OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=models.Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def create_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserStats = apps.get_model('user', 'UserStats')
+    UserStats.objects.bulk_create(
+        UserStats(user_id=pk)
+        for pk in User.objects.values_list('pk', flat=True).iterator()
+    )
+    UserStats.objects.update(
+        recipes_count=count_related(
+            apps.get_model('recipe', 'Recipe'), 'author'
+        ),
+        followers_count=count_related(
+            apps.get_model('user', 'Follow'), 'author'
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recipe', '0006_recipe_counters'),
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipes_count', models.PositiveIntegerField(default=0, verbose_name='Рецептов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+            ],
+            options={
+                'verbose_name': 'User statistics',
+                'verbose_name_plural': 'User statistics',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='follow',
+            options={'ordering': ('-id',), 'verbose_name': 'Subscription', 'verbose_name_plural': 'Subscriptions'},
+        ),
+        migrations.RunPython(create_stats, migrations.RunPython.noop),
+    ]
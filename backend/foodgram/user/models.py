@@ -21,6 +21,32 @@ class Follow(models.Model):
                 name='unique_name_follow'
             )
         ]
+        indexes = [
+            models.Index(fields=['user', '-id'], name='follow_user_id_idx')
+        ]
 
     def __str__(self):
         return f'{self.user} подписана на {self.author}'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляемые при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0, verbose_name='Рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписчиков'
+    )
+
+    class Meta:
+        verbose_name = 'User statistics'
+        verbose_name_plural = 'User statistics'
+
+    def __str__(self):
+        return f'Счётчики {self.user}'